@@ -0,0 +1,163 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from app.core.cache import cache_path
+from app.core.deduplication import extract_arxiv_id, normalize_title
+from app.agents.tools import normalize_url
+
+# Research artifacts shared by every pipeline (/research graph, autonomous roundtable)
+ARTIFACT_TTL = float(os.getenv("ARTIFACT_TTL", "604800"))  # Seconds an artifact is reused (default 7 days)
+ARTIFACT_VERSIONS = int(os.getenv("ARTIFACT_VERSIONS", "3"))  # Versions kept per (paper, kind)
+
+# Kinds: "sources" (search results + scraped text), "pdf_text", "brief" (research brief)
+
+def artifact_key(url: str = "", title: str = "") -> str:
+    """
+    The paper/page an artifact belongs to: the Arxiv ID when there is one (abs, pdf
+    and vN links share it), else the normalized URL without its scheme (http and
+    https links share it), else the normalized topic title.
+    """
+    arxiv_id = extract_arxiv_id(url or "") or extract_arxiv_id(title or "")
+    if arxiv_id:
+        return f"arxiv:{arxiv_id}"
+    if url and url.startswith(("http://", "https://")):
+        return f"url:{normalize_url(url).split('://', 1)[-1]}"
+    return f"topic:{normalize_title(title or '')}"
+
+class Unstored:
+    """A create() result for get_or_create() to return without storing it (e.g. a partial PDF extraction)."""
+
+    def __init__(self, value):
+        self.value = value
+
+class ArtifactStore:
+    """
+    Versioned artifacts in SQLite (CACHE_DIR/artifacts.sqlite3).
+    - Every put() adds a version; get() returns the newest one younger than the TTL.
+    - Only the last ARTIFACT_VERSIONS versions per (key, kind) are kept.
+    - get_or_create() is single-flight per (key, kind) within the process, so two
+      pipelines working on the same paper at once build an artifact only once.
+    """
+
+    def __init__(self, filename: str = "artifacts.sqlite3", ttl: float = ARTIFACT_TTL, versions: int = ARTIFACT_VERSIONS):
+        self.filename = filename
+        self.ttl = ttl
+        self.versions = max(1, versions)
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+        self._building = {}  # (key, kind) -> [asyncio.Lock, callers holding or waiting for it]
+
+    def _connect(self):
+        # Opened lazily, like DiskCache
+        if self._conn is None:
+            self._conn = sqlite3.connect(cache_path(self.filename), check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    key TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (key, kind, version)
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str, kind: str, max_age: float | None = None):
+        """
+        Returns the newest fresh version's value, or None.
+        Args:
+            key (str): artifact_key() of the paper.
+            kind (str): Artifact kind.
+            max_age (float): Override of the store TTL, in seconds.
+        """
+        oldest = time.time() - (self.ttl if max_age is None else max_age)
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM artifacts WHERE key = ? AND kind = ? AND created_at >= ? ORDER BY version DESC LIMIT 1",
+                (key, kind, oldest)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, kind: str, value) -> int:
+        """Stores `value` (JSON-serializable) as the next version and returns its number."""
+        payload = json.dumps(value)
+        with self._lock:
+            conn = self._connect()
+            version = conn.execute(
+                "SELECT COALESCE(MAX(version), 0) + 1 FROM artifacts WHERE key = ? AND kind = ?", (key, kind)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT INTO artifacts (key, kind, version, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, version, payload, time.time())
+            )
+            conn.execute(
+                "DELETE FROM artifacts WHERE key = ? AND kind = ? AND version <= ?", (key, kind, version - self.versions)
+            )
+            conn.commit()
+        return version
+
+    def history(self, key: str, kind: str) -> list:
+        """Stored versions, newest first: [{"version", "created_at", "value"}]."""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT version, created_at, value FROM artifacts WHERE key = ? AND kind = ? ORDER BY version DESC",
+                (key, kind)
+            ).fetchall()
+        return [{"version": version, "created_at": created_at, "value": json.loads(value)} for version, created_at, value in rows]
+
+    async def get_or_create(self, key: str, kind: str, create):
+        """
+        Returns the stored artifact, or awaits `create()` and stores its result.
+        Concurrent callers for the same (key, kind) wait for the first one.
+        A None result is returned but not stored (e.g. a failed download), and so is
+        the value of an Unstored result (usable now, not worth keeping).
+        """
+        value = self.get(key, kind)
+        if value is not None:
+            return value
+        # Refcounted, so the lock outlives every caller that got it: dropping it while one
+        # is still waiting would let a newcomer build the artifact under a fresh lock
+        entry = self._building.setdefault((key, kind), [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                value = self.get(key, kind)  # Built while we waited
+                if value is not None:
+                    return value
+                value = await create()
+                if isinstance(value, Unstored):
+                    return value.value
+                if value is not None:
+                    self.put(key, kind, value)
+                return value
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._building[(key, kind)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT kind, COUNT(DISTINCT key), COALESCE(SUM(LENGTH(value)), 0) FROM artifacts GROUP BY kind"
+            ).fetchall()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "kinds": {kind: {"keys": keys, "size_bytes": size} for kind, keys, size in rows},
+        }
+
+artifact_store = ArtifactStore()
@@ -1,22 +1,24 @@
 from typing import List, Dict, Any, Literal
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, BaseMessage
-from app.core.config import get_settings
-from app.agents.tools import search_web, scrape_web_content
+from app.core.metrics import timed, record_retry
+from app.core.llm_gateway import lazy_llm
+from app.agents.tools import search_web, scrape_many
+from app.agents.retrieval import BM25Index, RESEARCH_CONTEXT_TOKENS, join_chunks
+from app.agents.artifacts import artifact_store, artifact_key
+import asyncio
 import json
 import re
 from datetime import datetime
 
-settings = get_settings()
-
 # =============================================================================
 # STATE DEFINITION
 # =============================================================================
 
 class AgentState(TypedDict):
     topic: str
+    origin_url: str                 # Paper/page the topic came from (keys the artifact store)
     messages: List[BaseMessage]
     research_brief: str
     urls_visited: List[str]
@@ -34,53 +36,113 @@ class AgentState(TypedDict):
 # MODELS
 # =============================================================================
 
+# Built on first use (see LazyLLM), so importing the graph needs no API key
+
 # Fast model for research & evaluation
-research_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    google_api_key=settings.GOOGLE_API_KEY,
-    temperature=0.3
-)
+research_llm = lazy_llm("gemini-2.0-flash", temperature=0.3)
+
+# Evaluation nodes re-run on identical inputs (retries, re-runs), so they can opt in to the response cache (LLM_CACHE_NODES)
+self_reflect_llm = lazy_llm("gemini-2.0-flash", temperature=0.3, cache_node="self_reflect")
+critic_llm = lazy_llm("gemini-2.0-flash", temperature=0.3, cache_node="critic")
 
 # Creative model for writing
-writer_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash", 
-    google_api_key=settings.GOOGLE_API_KEY, 
-    temperature=0.7
-)
+writer_llm = lazy_llm("gemini-2.0-flash", temperature=0.7)
 
 # =============================================================================
 # AGENT NODES
 # =============================================================================
 
-def research_node(state: AgentState) -> dict:
+async def _gather_sources(query: str, urls: list) -> list:
+    """Searches and scrapes pages not visited yet. Returns [{"title", "href", "content"}]."""
+    search_results = await asyncio.to_thread(search_web, query, max_results=4)
+    
+    new_results = []
+    for res in search_results:
+        url = res['href']
+        if url not in urls:  # Avoid re-scraping same URLs
+            urls.append(url)
+            new_results.append(res)
+    
+    # Fetch all new pages at once; pages that miss the deadline are skipped
+    contents = await scrape_many([res['href'] for res in new_results])
+    return [
+        {"title": res['title'], "href": res['href'], "content": contents[res['href']]}
+        for res in new_results if contents.get(res['href']) is not None
+    ]
+
+@timed("node", "researcher")
+async def research_node(state: AgentState) -> dict:
     """
     Agent 1: The Researcher.
     Searches, scrapes, and synthesizes a research brief.
+    Sources and briefs are shared through the artifact store, so a paper
+    researched before (here or by the roundtable) isn't fetched or summarized again.
     """
     topic = state['topic']
     revision = state.get('revision_count', 0) > 0
+    key = artifact_key(state.get('origin_url', ''), topic)
+    urls = state.get('urls_visited', [])
     
     if revision:
         print(f"--- Researcher: RE-INVESTIGATING '{topic}' (feedback: {state.get('reflection_feedback', '')[:100]}...) ---")
+        record_retry()
+        # A revision is new work: fresh sources, and its brief becomes the newest version
+        brief = await _write_brief(state, key, urls)
+        artifact_store.put(key, "brief", brief)
     else:
         print(f"--- Researcher: Investigating '{topic}' ---")
+        built = False
+        
+        async def create():
+            nonlocal built
+            built = True
+            return await _write_brief(state, key, urls)
+        
+        brief = await artifact_store.get_or_create(key, "brief", create)
+        if not built:
+            print(f"--- Researcher: Reusing stored brief for '{topic}' ---")
+    
+    return {
+        "research_brief": brief,
+        "urls_visited": urls,
+        "status": "researched",
+        "critiques": [],
+        "debate_history": []
+    }
+
+async def _write_brief(state: AgentState, key: str, urls: list):
+    topic = state['topic']
+    revision = state.get('revision_count', 0) > 0
     
     # Search with different query if revising
     query = f"{topic} AI research breakdown analysis"
     if revision:
         query = f"{topic} technical details methodology results"
-    
-    search_results = search_web(query, max_results=4)
-    
+        sources = await _gather_sources(query, urls)
+    else:
+        async def gather():
+            return await _gather_sources(query, urls) or None  # Nothing found: don't store
+        sources = await artifact_store.get_or_create(key, "sources", gather) or []
+        urls.extend(source['href'] for source in sources if source['href'] not in urls)
+    
+    # The paper itself, if a pipeline already extracted it
+    pdf_text = artifact_store.get(key, "pdf_text")
+    if pdf_text:
+        sources = [{"title": f"{topic} (full text)", "href": state.get('origin_url', ''), "content": pdf_text}] + sources
+    
+    # Index every scraped page, then keep only the passages most relevant to the topic
+    # (and the reviewer's feedback) that fit the prompt budget
     brief_data = []
-    urls = state.get('urls_visited', [])
-    
-    for res in search_results:
-        url = res['href']
-        if url not in urls:  # Avoid re-scraping same URLs
-            urls.append(url)
-            content = scrape_web_content(url)
-            brief_data.append(f"Source: {res['title']}\nURL: {url}\nContent: {content[:8000]}...\n")
+    index = BM25Index()
+    for source in sources:
+        index.add(source['content'])
+    retrieval_query = f"{topic} {state.get('reflection_feedback', '')}" if revision else topic
+    selected = index.select(retrieval_query, RESEARCH_CONTEXT_TOKENS)
+    for number, source in enumerate(sources):
+        passages = join_chunks([chunk for chunk in selected if chunk.source == number])
+        if passages:
+            brief_data.append(f"Source: {source['title']}\nURL: {source['href']}\nContent: {passages}\n")
+    print(f"--- Researcher: Kept {len(selected)}/{len(index.chunks)} chunks from {len(sources)} sources ---")
     
     combined_text = "\n\n".join(brief_data)
     
@@ -108,18 +170,13 @@ def research_node(state: AgentState) -> dict:
     {combined_text}
     """
     
-    response = research_llm.invoke([HumanMessage(content=prompt)])
-    
-    return {
-        "research_brief": response.content,
-        "urls_visited": urls,
-        "status": "researched",
-        "critiques": [],
-        "debate_history": []
-    }
+    response = await research_llm.ainvoke([HumanMessage(content=prompt)])
+    return response.content
+
 
 
-def self_reflect_node(state: AgentState) -> dict:
+@timed("node", "self_reflect")
+async def self_reflect_node(state: AgentState) -> dict:
     """
     Self-Reflection Node: Evaluates research quality (1-10).
     Routes back to researcher if score < 6.
@@ -143,7 +200,7 @@ def self_reflect_node(state: AgentState) -> dict:
     {brief[:4000]}...
     """
     
-    response = research_llm.invoke([HumanMessage(content=prompt)])
+    response = await self_reflect_llm.ainvoke([HumanMessage(content=prompt)])
     
     # Parse the response
     try:
@@ -169,7 +226,8 @@ def self_reflect_node(state: AgentState) -> dict:
     }
 
 
-def writer_node(state: AgentState) -> dict:
+@timed("node", "writer")
+async def writer_node(state: AgentState) -> dict:
     """
     Agent 2: The Writer.
     Drafts the forum post, incorporating critic feedback on revisions.
@@ -178,6 +236,7 @@ def writer_node(state: AgentState) -> dict:
     
     if revision > 0:
         print(f"--- Writer: REVISING draft (attempt {revision + 1}) ---")
+        record_retry()
     else:
         print(f"--- Writer: Drafting Post ---")
     
@@ -210,7 +269,7 @@ def writer_node(state: AgentState) -> dict:
     {brief}
     """
     
-    response = writer_llm.invoke([HumanMessage(content=prompt)])
+    response = await writer_llm.ainvoke([HumanMessage(content=prompt)])
     
     return {
         "draft_post": response.content,
@@ -220,7 +279,8 @@ def writer_node(state: AgentState) -> dict:
     }
 
 
-def critic_node(state: AgentState) -> dict:
+@timed("node", "critic")
+async def critic_node(state: AgentState) -> dict:
     """
     Critic Node: Reviews the Writer's draft.
     Decides if revision is needed.
@@ -244,7 +304,7 @@ def critic_node(state: AgentState) -> dict:
     {draft[:3000]}...
     """
     
-    response = research_llm.invoke([HumanMessage(content=prompt)])
+    response = await critic_llm.ainvoke([HumanMessage(content=prompt)])
     
     # Parse response
     try:
@@ -273,7 +333,8 @@ def critic_node(state: AgentState) -> dict:
     }
 
 
-def debate_skeptic_node(state: AgentState) -> dict:
+@timed("node", "debate_skeptic")
+async def debate_skeptic_node(state: AgentState) -> dict:
     """
     Debate Node: Skeptic's turn.
     Responds to research AND Hype's previous argument (if any).
@@ -312,7 +373,7 @@ def debate_skeptic_node(state: AgentState) -> dict:
     {brief[:2000]}...
     """
     
-    response = writer_llm.invoke([HumanMessage(content=prompt)])
+    response = await writer_llm.ainvoke([HumanMessage(content=prompt)])
     
     new_history = debate_history + [{"persona": "Skeptic", "content": response.content, "round": debate_round + 1}]
     
@@ -322,7 +383,8 @@ def debate_skeptic_node(state: AgentState) -> dict:
     }
 
 
-def debate_hype_node(state: AgentState) -> dict:
+@timed("node", "debate_hype")
+async def debate_hype_node(state: AgentState) -> dict:
     """
     Debate Node: Hype's turn.
     Responds to Skeptic's criticism.
@@ -360,7 +422,7 @@ def debate_hype_node(state: AgentState) -> dict:
     {brief[:2000]}...
     """
     
-    response = writer_llm.invoke([HumanMessage(content=prompt)])
+    response = await writer_llm.ainvoke([HumanMessage(content=prompt)])
     
     new_history = debate_history + [{"persona": "Hype", "content": response.content, "round": debate_round + 1}]
     
@@ -371,7 +433,8 @@ def debate_hype_node(state: AgentState) -> dict:
     }
 
 
-def synthesizer_node(state: AgentState) -> dict:
+@timed("node", "synthesizer")
+async def synthesizer_node(state: AgentState) -> dict:
     """
     Synthesizer Node: Combines debate into final critiques.
     """
@@ -498,5 +561,17 @@ workflow.add_conditional_edges(
 # === END ===
 workflow.add_edge("synthesizer", END)
 
-# Compile the graph
-app = workflow.compile()
+def build_app(checkpointer=None):
+    """
+    Compiles the graph. With a checkpointer, state is saved after every node,
+    so a run (identified by config["configurable"]["thread_id"]) can be
+    inspected and resumed from its last completed node.
+    """
+    return workflow.compile(checkpointer=checkpointer)
+
+def __getattr__(name):
+    # `app` (the graph without checkpoints) is compiled on first access, not at import
+    if name == "app":
+        globals()["app"] = build_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
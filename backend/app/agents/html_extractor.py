@@ -0,0 +1,136 @@
+import codecs
+import os
+import re
+from html.parser import HTMLParser
+
+# Optional C parser (pip install selectolax); the streaming stdlib parser is used otherwise
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# "auto", "selectolax" or "stdlib"
+HTML_EXTRACTOR = os.getenv("HTML_EXTRACTOR", "auto").lower()
+# In "auto", selectolax parses pages up to this size; bigger ones are streamed, since
+# stopping at the budget beats parsing the whole page even in C (benchmarks/html_extract.py)
+AUTO_SELECTOLAX_MAX_CHARS = 256 * 1024
+HTML_TEXT_MAX_CHARS = 20000
+SKIP_TAGS = frozenset({"script", "style", "nav", "footer"})  # Boilerplate dropped while parsing
+FEED_CHUNK_CHARS = 16 * 1024  # Parser input granularity; bounds the work done past the budget
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+
+def decode_html(data: bytes, encoding: str | None = None) -> str:
+    """
+    Decodes a page: HTTP charset, else <meta charset>, else UTF-8, else Windows-1252.
+    Args:
+        data (bytes): Raw body.
+        encoding (str): Charset from the Content-Type header, if any.
+    Returns:
+        str: Decoded markup (undecodable bytes replaced).
+    """
+    if data.startswith(codecs.BOM_UTF8):
+        return data[len(codecs.BOM_UTF8):].decode("utf-8", errors="replace")
+    if not encoding:
+        match = _META_CHARSET.search(data[:4096])
+        encoding = match.group(1).decode("ascii") if match else None
+    if encoding:
+        try:
+            return data.decode(encoding, errors="replace")
+        except LookupError:
+            pass  # Unknown charset name
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return data.decode("windows-1252", errors="replace")
+
+class _BudgetReached(Exception):
+    pass
+
+class _TextCollector(HTMLParser):
+    """Collects stripped text nodes outside SKIP_TAGS until `max_chars` are gathered."""
+
+    def __init__(self, max_chars: int):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.parts = []
+        self.length = 0
+        self.skip_depth = 0
+        self._pending = []  # Data of the current text node (the parser may split it across feeds)
+        self._pending_length = 0
+
+    def _flush(self):
+        text = "".join(self._pending).strip()
+        self._pending = []
+        self._pending_length = 0
+        if text:
+            self.parts.append(text)
+            self.length += len(text) + 1
+            if self.length >= self.max_chars:
+                raise _BudgetReached()
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in SKIP_TAGS:
+            self.skip_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()  # <nav/> opens nothing
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_data(self, data):
+        if self.skip_depth:
+            return
+        self._pending.append(data)
+        self._pending_length += len(data)
+        if self.length + self._pending_length >= self.max_chars:
+            self._flush()  # One huge text node: no need to wait for its end
+
+    def close(self):
+        super().close()
+        self._flush()
+
+def _extract_stdlib(markup: str, max_chars: int) -> str:
+    collector = _TextCollector(max_chars)
+    try:
+        for start in range(0, len(markup), FEED_CHUNK_CHARS):
+            collector.feed(markup[start:start + FEED_CHUNK_CHARS])
+        collector.close()
+    except _BudgetReached:
+        pass
+    return " ".join(collector.parts)[:max_chars]
+
+def _extract_selectolax(markup: str, max_chars: int) -> str:
+    tree = LexborHTMLParser(markup)
+    tree.strip_tags(list(SKIP_TAGS))
+    root = tree.root
+    return root.text(separator=" ", strip=True)[:max_chars] if root is not None else ""
+
+def extract_text(data: bytes, encoding: str | None = None, max_chars: int = HTML_TEXT_MAX_CHARS,
+                 engine: str = HTML_EXTRACTOR) -> str:
+    """
+    Visible text of an HTML page, boilerplate (SKIP_TAGS) removed, capped at `max_chars`.
+    The stdlib engine streams the markup and stops as soon as the budget is
+    filled instead of building the whole document tree.
+    Args:
+        data (bytes): Raw HTML body.
+        encoding (str): Charset from the Content-Type header, if any.
+        max_chars (int): Text budget.
+        engine (str): "auto" (selectolax for small pages if installed), "selectolax" or "stdlib".
+    Returns:
+        str: Text nodes joined by single spaces.
+    """
+    markup = decode_html(data, encoding)
+    use_selectolax = LexborHTMLParser is not None and (
+        engine == "selectolax" or (engine == "auto" and len(markup) <= AUTO_SELECTOLAX_MAX_CHARS)
+    )
+    if use_selectolax:
+        return _extract_selectolax(markup, max_chars)
+    return _extract_stdlib(markup, max_chars)
@@ -1,18 +1,27 @@
+import asyncio
 import json
-from langchain_google_genai import ChatGoogleGenerativeAI
+import os
 from langchain_core.messages import HumanMessage, SystemMessage
-from app.core.config import get_settings
+from app.core.metrics import timed
+from app.core.llm_gateway import lazy_llm
 from app.agents.workers import WorkerNode
+from app.agents.memory import ConversationMemory
 from app.services.supabase_client import get_supabase
-
-settings = get_settings()
+from app.services.comment_buffer import CommentBuffer
+from app.core.deduplication import record_thread
+from app.agents.artifacts import artifact_store, artifact_key
 
 # Manager uses Flash Preview for orchestration (high speed, good reasoning)
-manager_llm = ChatGoogleGenerativeAI(
-    model="gemini-3-flash-preview", 
-    google_api_key=settings.GOOGLE_API_KEY,
-    temperature=0.8
-)
+# (built on first use, see LazyLLM)
+personas_llm = lazy_llm("gemini-3-flash-preview", temperature=0.8, cache_node="personas")  # Opt-in via LLM_CACHE_NODES
+
+# Low-temperature model that folds older roundtable turns into a running summary
+summary_llm = lazy_llm("gemini-2.0-flash", temperature=0.2)
+
+# Opening statements: every persona answers the intro at once (debate turns stay sequential)
+ROUNDTABLE_PARALLEL_OPENINGS = os.getenv("ROUNDTABLE_PARALLEL_OPENINGS", "true").lower() == "true"
+ROUNDTABLE_CONCURRENCY = int(os.getenv("ROUNDTABLE_CONCURRENCY", "4"))  # Max personas generating at once
+ROUNDTABLE_DEBATE_ROUNDS = int(os.getenv("ROUNDTABLE_DEBATE_ROUNDS", "2"))
 
 class ManagerAgent:
     """
@@ -24,8 +33,10 @@ class ManagerAgent:
     
     def __init__(self):
         self.supabase = get_supabase()
+        self.comment_buffer = None  # Set while a roundtable is running
 
-    def generate_personas(self, topic: str):
+    @timed("roundtable", "personas")
+    async def generate_personas(self, topic: str):
         """
         Creates 3-4 unique agent identities for this specific topic.
         """
@@ -49,7 +60,7 @@ class ManagerAgent:
         Example JSON format only.
         """
         
-        response = manager_llm.invoke([HumanMessage(content=prompt)])
+        response = await personas_llm.ainvoke([HumanMessage(content=prompt)])
         
         # Handle potential list content (common with some Gemini versions)
         raw_content = response.content
@@ -81,73 +92,117 @@ class ManagerAgent:
                 {"name": "Cipher", "role": "Skeptic", "style": "Critical", "backstory": "Security Engineer"}
             ]
 
-    def run_roundtable(self, topic_data: dict):
+    async def run_roundtable(self, topic_data: dict):
         topic = topic_data['topic']
         origin = topic_data.get('source', 'Unknown')
         origin_url = topic_data.get('origin_url', '')
         
         # 1. Cast the agents
-        roster_data = self.generate_personas(topic)
+        roster_data = await self.generate_personas(topic)
         workers = [WorkerNode(p) for p in roster_data]
         
+        # A brief written earlier for this paper (e.g. by /research) is reused, not redone
+        key = artifact_key(origin_url, topic)
+        stored_brief = artifact_store.get(key, "brief")
+        
         # 2. Create Thread in DB
         print(f"--- Manager: Opening Thread '{topic}' ---")
-        thread_res = self.supabase.table("threads").insert({
+        thread_res = await asyncio.to_thread(self.supabase.table("threads").insert({
             "topic_title": topic,
             "summary": f"A roundtable debate on {topic} (Source: {origin})",
-            "research_brief": topic_data.get("summary", "")[:500] if topic_data.get("summary") else ""
-        }).execute()
+            "research_brief": str(stored_brief) if stored_brief else (topic_data.get("summary", "")[:500] if topic_data.get("summary") else "")
+        }).execute)
         
         if not thread_res.data:
             print("Failed to create thread")
             return
             
         thread_id = thread_res.data[0]['id']
+        record_thread(topic)
         
-        # 3. Start Debate Loop
-        discussion_history = []
-        context_data = {
-            "topic": topic,
-            "origin_url": origin_url
-        }
+        # Comments are buffered and bulk-inserted so LLM turns never wait on the DB
+        self.comment_buffer = CommentBuffer(self.supabase)
+        try:
+            # 3. Start Debate Loop
+            # Recent turns verbatim + running summary, so prompts don't grow with every turn
+            memory = ConversationMemory(summary_llm)
+            context_data = {
+                "topic": topic,
+                "origin_url": origin_url,
+                "artifact_key": key,
+                "research_brief": stored_brief
+            }
         
-        # Intro by Manager
-        intro_msg = f"Welcome everyone. Today we are discussing '{topic}', found on {origin}. Let's dive in."
-        self.save_comment(thread_id, "Manager", intro_msg, "Host")
-        discussion_history.append(f"Manager: {intro_msg}")
+            # Intro by Manager
+            intro_msg = f"Welcome everyone. Today we are discussing '{topic}', found on {origin}. Let's dive in."
+            self.save_comment(thread_id, "Manager", intro_msg, "Host")
+            await memory.add(f"Manager: {intro_msg}")
         
-        # Process Logic: Cycle through Roster
-        # First pass: Everyone speaks once to establish position
-        for agent in workers:
-            try:
-                # Use cached research if available
-                # Pass context
-                resp = agent.generate_response([], "\n".join(discussion_history), context_data)
-                self.save_comment(thread_id, agent.name, resp, agent.role)
-                discussion_history.append(f"{agent.name} ({agent.role}): {resp}")
-            except Exception as e:
-                print(f"Error generating response for {agent.name}: {e}")
+            # Process Logic: Cycle through Roster
+            # First pass: Everyone speaks once to establish position
+            if ROUNDTABLE_PARALLEL_OPENINGS:
+                openings = await self.opening_statements(workers, memory.render(), context_data)
+                # Saved in roster order, so the thread reads the same as a sequential pass
+                for agent, resp in zip(workers, openings):
+                    if resp is not None:
+                        self.save_comment(thread_id, agent.name, resp, agent.role)
+                        await memory.add(f"{agent.name} ({agent.role}): {resp}")
+            else:
+                for agent in workers:
+                    try:
+                        # Use cached research if available
+                        # Pass context
+                        resp = await agent.generate_response([], memory.render(), context_data)
+                        self.save_comment(thread_id, agent.name, resp, agent.role)
+                        await memory.add(f"{agent.name} ({agent.role}): {resp}")
+                    except Exception as e:
+                        print(f"Error generating response for {agent.name}: {e}")
 
-        # Debate phase: 2 rounds of random debate
-        # Simple Logic: Pick random agents to respond to previous
-        import random
-        for _ in range(2):
-            speaker = random.choice(workers)
-            try:
-                resp = speaker.generate_response([], "\n".join(discussion_history), context_data)
-                self.save_comment(thread_id, speaker.name, resp, speaker.role)
-                discussion_history.append(f"{speaker.name} ({speaker.role}): {resp}")
-            except Exception as e:
-                print(f"Error in debate round: {e}")
+            # Debate phase: ROUNDTABLE_DEBATE_ROUNDS rounds of random debate
+            # Simple Logic: Pick random agents to respond to previous
+            import random
+            for _ in range(ROUNDTABLE_DEBATE_ROUNDS):
+                speaker = random.choice(workers)
+                try:
+                    resp = await speaker.generate_response([], memory.render(), context_data)
+                    self.save_comment(thread_id, speaker.name, resp, speaker.role)
+                    await memory.add(f"{speaker.name} ({speaker.role}): {resp}")
+                except Exception as e:
+                    print(f"Error in debate round: {e}")
+        finally:
+            # close() waits for the final bulk insert; keep that off the event loop
+            await asyncio.to_thread(self.comment_buffer.close)
+            self.comment_buffer = None
 
         print("--- Manager: Debate Closed ---")
 
+    async def opening_statements(self, workers, intro_history: str, context_data: dict):
+        """
+        Every agent answers the intro concurrently (at most ROUNDTABLE_CONCURRENCY at once).
+        Returns responses in roster order; None for agents that failed.
+        """
+        semaphore = asyncio.Semaphore(ROUNDTABLE_CONCURRENCY)
+
+        async def speak(agent):
+            async with semaphore:
+                try:
+                    return await agent.generate_response([], intro_history, context_data)
+                except Exception as e:
+                    print(f"Error generating response for {agent.name}: {e}")
+                    return None
+
+        return await asyncio.gather(*(speak(agent) for agent in workers))
+
     def save_comment(self, thread_id, agent_name, content, role="Manager"):
+        row = {
+            "thread_id": thread_id,
+            "agent_persona": agent_name, 
+            "content": f"**[{role}]** {content}" 
+        }
+        if self.comment_buffer is not None:
+            self.comment_buffer.add(row)
+            return
         try:
-            self.supabase.table("comments").insert({
-                "thread_id": thread_id,
-                "agent_persona": agent_name, 
-                "content": f"**[{role}]** {content}" 
-            }).execute()
+            self.supabase.table("comments").insert(row).execute()
         except Exception as e:
             print(f"Error saving comment: {e}")
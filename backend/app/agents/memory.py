@@ -0,0 +1,79 @@
+import os
+from langchain_core.messages import HumanMessage
+from app.core.metrics import timed
+
+# Roundtable prompt budget
+ROUNDTABLE_RECENT_TURNS = int(os.getenv("ROUNDTABLE_RECENT_TURNS", "4"))  # Turns kept verbatim
+ROUNDTABLE_HISTORY_TOKENS = int(os.getenv("ROUNDTABLE_HISTORY_TOKENS", "2000"))  # History budget per prompt
+FOLD_BATCH = 2  # Older turns are folded into the summary this many at a time
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars per token), good enough for budgeting."""
+    return len(text) // 4 + 1
+
+class ConversationMemory:
+    """
+    Discussion history for roundtable prompts.
+    The last `keep_last` turns stay verbatim; older turns are folded into a
+    running summary (one small LLM call per FOLD_BATCH turns), so prompt size
+    stays flat instead of growing with every turn.
+    """
+
+    def __init__(self, summarizer, keep_last: int = ROUNDTABLE_RECENT_TURNS, max_tokens: int = ROUNDTABLE_HISTORY_TOKENS):
+        self.summarizer = summarizer
+        self.keep_last = keep_last
+        self.max_tokens = max_tokens
+        self.summary = ""
+        self.to_fold = []  # Evicted from `recent`, not yet summarized
+        self.recent = []
+
+    async def add(self, turn: str):
+        """Appends a turn ("Name (Role): text"), folding older turns if needed."""
+        self.recent.append(turn)
+        if len(self.recent) > self.keep_last:
+            overflow = len(self.recent) - self.keep_last
+            self.to_fold.extend(self.recent[:overflow])
+            self.recent = self.recent[overflow:]
+        if len(self.to_fold) >= FOLD_BATCH:
+            await self._fold()
+
+    @timed("roundtable", "summarize")
+    async def _fold(self):
+        turns = "\n".join(self.to_fold)
+        summary_words = self.max_tokens // 4  # Leave most of the budget to verbatim turns
+        prompt = f"""
+        Update the running summary of a roundtable discussion.
+        Keep who said what, key claims, disagreements and open questions.
+        Write at most {summary_words} words. Output ONLY the summary.
+
+        Current summary:
+        {self.summary or "(none yet)"}
+
+        New turns:
+        {turns}
+        """
+        try:
+            response = await self.summarizer.ainvoke([HumanMessage(content=prompt)])
+            content = response.content
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+            self.summary = str(content).strip()
+        except Exception as e:
+            # Never lose the turns: keep them (clipped) in the summary instead
+            print(f"Error summarizing discussion: {e}")
+            self.summary = f"{self.summary}\n{turns}".strip()[-summary_words * 4:]
+        self.to_fold = []
+
+    def render(self) -> str:
+        """History text for the next prompt, capped at `max_tokens`."""
+        recent = self.to_fold + self.recent
+        # Drop the oldest verbatim turns first, but always keep the latest one
+        while len(recent) > 1 and estimate_tokens(self.summary + "".join(recent)) > self.max_tokens:
+            recent = recent[1:]
+
+        parts = []
+        summary_chars = (self.max_tokens - estimate_tokens("".join(recent))) * 4
+        if self.summary and summary_chars > 0:
+            parts.append(f"Summary of the discussion so far:\n{self.summary[-summary_chars:]}")
+        parts.append("\n".join(recent))
+        return "\n\n".join(parts)
@@ -0,0 +1,111 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pypdf import PdfReader
+
+# --- PDF extraction limits ---
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "2"))  # 0 = extract inline (no process pool)
+PDF_PAGE_BUDGET = int(os.getenv("PDF_PAGE_BUDGET", "10"))  # Pages read per document
+PDF_TIMEOUT = float(os.getenv("PDF_TIMEOUT", "20"))  # Seconds per document
+PDF_WORKER_TASKS = 500  # Pages a worker extracts before it is recycled
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_users = {}  # pool -> documents in flight on it
+
+# Worker side: documents parsed in this process, by path (a worker usually gets several pages of one)
+_readers = OrderedDict()
+_READERS_KEPT = 2
+
+def _extract_page(path: str, index: int) -> str:
+    """
+    Worker: extract the text of page `index` of the PDF at `path`.
+    Runs in a child process, so a slow or pathological page can't block the API.
+    The document is parsed once per worker and reused for its other pages.
+    """
+    reader = _readers.get(path)
+    if reader is None:
+        with open(path, "rb") as f:
+            reader = PdfReader(io.BytesIO(f.read()))
+        _readers[path] = reader
+        while len(_readers) > _READERS_KEPT:
+            _readers.popitem(last=False)
+    else:
+        _readers.move_to_end(path)
+    if index >= len(reader.pages):
+        return None  # Past the end of a short document
+    return reader.pages[index].extract_text() or ""
+
+def _acquire_pool():
+    """The current pool, counted as in use until _release_pool()."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: children start clean instead of inheriting the server's threads and locks
+            ctx = multiprocessing.get_context("spawn")
+            _pool = ctx.Pool(processes=PDF_WORKERS, maxtasksperchild=PDF_WORKER_TASKS)
+        _pool_users[_pool] = _pool_users.get(_pool, 0) + 1
+        return _pool
+
+def _release_pool(pool, stuck: bool):
+    """
+    Ends one document's use of `pool`. A pool with a stuck worker is retired:
+    new documents get a fresh pool, and the old one is terminated once the
+    documents still running on it are done, so they keep their pages.
+    """
+    global _pool
+    with _pool_lock:
+        _pool_users[pool] -= 1
+        if stuck and _pool is pool:
+            _pool = None
+        retire = _pool is not pool and _pool_users[pool] == 0
+        if retire:
+            del _pool_users[pool]
+    if retire:
+        pool.terminate()
+
+def extract_pdf_text(data: bytes, page_budget: int = PDF_PAGE_BUDGET, timeout: float = PDF_TIMEOUT) -> tuple[str, bool]:
+    """
+    Extract text from the first `page_budget` pages of a PDF.
+    Pages are handed out to a process pool by index; the document travels as a
+    temp file, not per task. Pages that don't finish within `timeout` are dropped
+    and the stuck workers are replaced.
+    Args:
+        data (bytes): The PDF file.
+        page_budget (int): Max pages to read.
+        timeout (float): Seconds to wait for the whole document.
+    Returns:
+        tuple: (page texts joined by newlines, complete). complete is False when pages
+            timed out and were skipped: use the text, but don't cache or store it.
+    """
+    if PDF_WORKERS <= 0:
+        reader = PdfReader(io.BytesIO(data))
+        pages = reader.pages[:page_budget]
+        return "".join((page.extract_text() or "") + "\n" for page in pages), True
+
+    with tempfile.NamedTemporaryFile(prefix="pdf-", suffix=".pdf", delete=False) as f:
+        f.write(data)
+    pool = _acquire_pool()
+    timed_out = False
+    try:
+        jobs = [pool.apply_async(_extract_page, (f.name, index)) for index in range(page_budget)]
+        pages = []
+        deadline = time.monotonic() + timeout
+        for job in jobs:
+            try:
+                pages.append(job.get(timeout=max(0.0, deadline - time.monotonic())))
+            except multiprocessing.TimeoutError:
+                timed_out = True
+                pages.append(None)
+    finally:
+        _release_pool(pool, stuck=timed_out)
+        os.unlink(f.name)  # Pages of a timed-out document that are still queued fail fast without it
+
+    if timed_out:
+        from app.core.metrics import record_error  # Not at the top: pool workers import this module
+        record_error()  # Counted against the calling step (tool/read_pdf); finished pages are kept
+    return "".join(page + "\n" for page in pages if page is not None), not timed_out
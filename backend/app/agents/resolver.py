@@ -0,0 +1,203 @@
+import asyncio
+import ipaddress
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# DNS answers are cached; failures/blocked hosts for a shorter time
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "300"))
+DNS_NEGATIVE_TTL = float(os.getenv("DNS_NEGATIVE_TTL", "30"))
+DNS_CACHE_MAX_HOSTS = 4096  # Expired entries are pruned past this size
+
+# Cloud metadata endpoints (most are also non-global; listed so they stay blocked regardless)
+METADATA_ADDRESSES = {
+    ipaddress.ip_address("169.254.169.254"),  # AWS, GCP, Azure, OpenStack
+    ipaddress.ip_address("169.254.170.2"),    # AWS ECS task metadata
+    ipaddress.ip_address("100.100.100.200"),  # Alibaba Cloud
+    ipaddress.ip_address("fd00:ec2::254"),    # AWS IPv6
+}
+NAT64_PREFIX = ipaddress.ip_network("64:ff9b::/96")
+
+class UnsafeHostError(Exception):
+    """Raised when a connection is attempted to a host that wasn't vetted."""
+
+def is_public_ip(ip) -> bool:
+    """
+    True only for globally routable unicast addresses.
+    Rejects private, loopback, link-local, shared (CGNAT), reserved, multicast,
+    unspecified and metadata addresses, for IPv4 and IPv6, including IPv4
+    embedded in IPv6 (mapped, 6to4, NAT64).
+    """
+    ip = ipaddress.ip_address(ip)
+    if ip.version == 6:
+        embedded = ip.ipv4_mapped or ip.sixtofour
+        if embedded is None and ip in NAT64_PREFIX:
+            embedded = ipaddress.IPv4Address(int(ip) & 0xFFFFFFFF)
+        if embedded is not None and not is_public_ip(embedded):
+            return False
+    if ip in METADATA_ADDRESSES or ip.is_multicast:
+        return False
+    return ip.is_global
+
+class SafeResolver:
+    """
+    Resolves hostnames once, vets every address, and remembers the answer.
+    - Answers are cached for DNS_CACHE_TTL seconds (blocked/failed ones for DNS_NEGATIVE_TTL).
+    - A host is safe only if *all* its addresses are public, so a mixed
+      public/private answer can't be used to reach an internal service.
+    - The vetted address is pinned: PinnedAdapter connects to it instead of
+      resolving again, which closes the DNS-rebinding window.
+    """
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL, negative_ttl: float = DNS_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._cache = {}  # host -> (expires_at, vetted ip or None)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(host: str) -> str:
+        return host.strip("[]").rstrip(".").lower()
+
+    def _cached(self, host: str):
+        with self._lock:
+            entry = self._cache.get(host)
+        if entry and entry[0] > time.monotonic():
+            return entry
+        return None
+
+    def _store(self, host: str, addresses: list) -> str | None:
+        safe = bool(addresses) and all(is_public_ip(address) for address in addresses)
+        ip = addresses[0] if safe else None
+        ttl = self.ttl if safe else self.negative_ttl
+        now = time.monotonic()
+        with self._lock:
+            if len(self._cache) >= DNS_CACHE_MAX_HOSTS:
+                self._cache = {key: entry for key, entry in self._cache.items() if entry[0] > now}
+            self._cache[host] = (now + ttl, ip)
+        return ip
+
+    @staticmethod
+    def _literal(host: str):
+        try:
+            return ipaddress.ip_address(host)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _addresses(infos) -> list:
+        # Drop IPv6 scope ids ("fe80::1%eth0"); order is kept (first = preferred)
+        return list(dict.fromkeys(info[4][0].split("%")[0] for info in infos))
+
+    def vet(self, host: str) -> str | None:
+        """Returns the pinned, public IP for `host`, or None if it is unsafe or doesn't resolve."""
+        host = self._key(host)
+        literal = self._literal(host)
+        if literal is not None:
+            return self._store(host, [str(literal)])
+        entry = self._cached(host)
+        if entry:
+            return entry[1]
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError, OSError):
+            infos = []
+        return self._store(host, self._addresses(infos))
+
+    async def avet(self, host: str) -> str | None:
+        """Async vet(): resolution runs in the loop's executor, so a slow DNS server never stalls the loop."""
+        host = self._key(host)
+        if self._literal(host) is not None:
+            return self.vet(host)
+        entry = self._cached(host)
+        if entry:
+            return entry[1]
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except (socket.gaierror, UnicodeError, OSError):
+            infos = []
+        return self._store(host, self._addresses(infos))
+
+    def pinned(self, host: str) -> str:
+        """The address vetted for `host`; refuses hosts that were never vetted."""
+        # Expiry is ignored here: the fetch right after vet() must use the answer vet() checked
+        with self._lock:
+            entry = self._cache.get(self._key(host))
+        ip = entry[1] if entry else None
+        if ip is None:
+            raise UnsafeHostError(f"Host '{host}' was not vetted")
+        return ip
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+resolver = SafeResolver()
+
+def vet_url(url: str) -> str | None:
+    """Returns the pinned IP for the URL's host, or None if the URL isn't safe to fetch."""
+    try:
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return None
+        return resolver.vet(parsed.hostname)
+    except ValueError:
+        return None
+
+async def avet_url(url: str) -> str | None:
+    """Async vet_url()."""
+    try:
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or not parsed.hostname:
+            return None
+        return await resolver.avet(parsed.hostname)
+    except ValueError:
+        return None
+
+# --- Pinned connections: connect to the vetted IP, keep Host/SNI/cert checks on the hostname ---
+
+class _PinnedConnectionMixin:
+    def _new_conn(self):
+        dns_host = self._dns_host
+        self._dns_host = resolver.pinned(dns_host)
+        try:
+            return super()._new_conn()
+        finally:
+            self._dns_host = dns_host
+
+class PinnedHTTPConnection(_PinnedConnectionMixin, HTTPConnection):
+    pass
+
+class PinnedHTTPSConnection(_PinnedConnectionMixin, HTTPSConnection):
+    pass
+
+class PinnedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = PinnedHTTPConnection
+
+class PinnedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = PinnedHTTPSConnection
+
+class PinnedAdapter(HTTPAdapter):
+    """requests adapter whose connections go to the resolver's pinned address."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": PinnedHTTPConnectionPool,
+            "https": PinnedHTTPSConnectionPool,
+        }
+
+def pinned_session() -> requests.Session:
+    """A requests Session that only connects to vetted, pinned addresses (keep-alive pools are reused)."""
+    session = requests.Session()
+    session.trust_env = False  # A proxy would resolve the host itself, bypassing the pin
+    adapter = PinnedAdapter()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,154 @@
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass
+from app.agents.memory import estimate_tokens
+
+# Scraped pages / PDFs are split into chunks of about this many characters
+RETRIEVAL_CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1200"))
+# Prompt budgets (approx. tokens, see memory.estimate_tokens) for retrieved context
+RESEARCH_CONTEXT_TOKENS = int(os.getenv("RESEARCH_CONTEXT_TOKENS", "4000"))  # Researcher node, all sources
+PDF_CONTEXT_TOKENS = int(os.getenv("PDF_CONTEXT_TOKENS", "2500"))            # Roundtable Researcher, the paper
+SOCIAL_CONTEXT_TOKENS = int(os.getenv("SOCIAL_CONTEXT_TOKENS", "1000"))      # Roundtable Analyst, the thread
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_STOPWORDS = frozenset("""a an and are as at be by for from has have in is it its of on or that the this to was were
+will with we our you your they their can not but than then so such these those which who what how via using""".split())
+
+def tokenize(text: str) -> list:
+    return [word for word in re.findall(r"\w+", text.lower()) if word not in _STOPWORDS and len(word) > 1]
+
+def chunk_text(text: str, size: int = RETRIEVAL_CHUNK_CHARS) -> list:
+    """
+    Splits text into ~`size`-char chunks, cutting at the last paragraph, sentence
+    or word break before the limit. Chunks don't overlap, so adjacent ones join back seamlessly.
+    """
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            window = text[start:end]
+            cut = max(window.rfind("\n\n"), window.rfind(". "), window.rfind("? "), window.rfind("! "))
+            if cut < size // 2:
+                cut = window.rfind(" ")
+            if cut >= size // 2:
+                end = start + cut + 1
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end
+    return chunks
+
+@dataclass
+class Chunk:
+    source: int    # Order the source was added in
+    position: int  # Order within the source
+    text: str
+    score: float = 0.0
+
+class BM25Index:
+    """
+    In-memory Okapi BM25 over chunks of one run's sources.
+    Built per node/turn and thrown away; a few hundred chunks score in milliseconds.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.sources = 0
+        self._terms = []  # Counter per chunk
+        self._lengths = []
+        self._postings = {}  # term -> chunk ids
+        self._total_length = 0
+
+    def add(self, text: str) -> int:
+        """
+        Chunks and indexes one source.
+        Args:
+            text (str): Page or PDF text.
+        Returns:
+            int: The source number, as used in Chunk.source.
+        """
+        source = self.sources
+        self.sources += 1
+        for position, piece in enumerate(chunk_text(text)):
+            terms = Counter(tokenize(piece))
+            chunk_id = len(self.chunks)
+            self.chunks.append(Chunk(source, position, piece))
+            self._terms.append(terms)
+            self._lengths.append(sum(terms.values()))
+            self._total_length += self._lengths[-1]
+            for term in terms:
+                self._postings.setdefault(term, []).append(chunk_id)
+        return source
+
+    def search(self, query: str) -> list:
+        """Chunks matching any query term, best BM25 score first."""
+        if not self.chunks:
+            return []
+        count = len(self.chunks)
+        average_length = self._total_length / count or 1.0
+        scores = Counter()
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term, [])
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id in postings:
+                frequency = self._terms[chunk_id][term]
+                scores[chunk_id] += idf * frequency * (BM25_K1 + 1) / (
+                    frequency + BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[chunk_id] / average_length)
+                )
+        results = []
+        for chunk_id, score in scores.most_common():
+            chunk = self.chunks[chunk_id]
+            results.append(Chunk(chunk.source, chunk.position, chunk.text, score))
+        return results
+
+    def select(self, query: str, max_tokens: int) -> list:
+        """
+        The best chunks for `query` that fit in `max_tokens`, in document order.
+        Sources that fit whole are kept whole.
+        Args:
+            query (str): What the prompt is about (topic, feedback).
+            max_tokens (int): Budget for the selected text.
+        Returns:
+            list: Chunks ordered by (source, position).
+        """
+        if sum(estimate_tokens(chunk.text) for chunk in self.chunks) <= max_tokens:
+            return list(self.chunks)
+        ranked = self.search(query)
+        # The opening chunk of each source (title, abstract) ranks after matches but before unmatched text
+        seen = {(chunk.source, chunk.position) for chunk in ranked}
+        ranked += [chunk for chunk in self.chunks if chunk.position == 0 and (chunk.source, 0) not in seen]
+        selected, used = [], 0
+        for chunk in ranked:
+            tokens = estimate_tokens(chunk.text)
+            if used + tokens > max_tokens:
+                continue
+            selected.append(chunk)
+            used += tokens
+        return sorted(selected, key=lambda chunk: (chunk.source, chunk.position))
+
+def select_passages(text: str, query: str, max_tokens: int) -> str:
+    """
+    The parts of one document most relevant to `query`, within `max_tokens`.
+    Non-adjacent chunks are separated by "[...]".
+    """
+    index = BM25Index()
+    index.add(text)
+    return join_chunks(index.select(query, max_tokens))
+
+def join_chunks(chunks: list) -> str:
+    """Chunk texts in the given order, "[...]" marking skipped text."""
+    parts = []
+    previous = None
+    for chunk in chunks:
+        if previous is not None and (chunk.source != previous.source or chunk.position != previous.position + 1):
+            parts.append("[...]")
+        parts.append(chunk.text)
+        previous = chunk
+    return "\n".join(parts)
@@ -1,41 +1,27 @@
 import arxiv
+import asyncio
 import requests
-import io
 from ddgs import DDGS
-from bs4 import BeautifulSoup
-from pypdf import PdfReader
+import os
 import random
+import time
+from app.core.cache import DiskCache
+from app.core.metrics import timed, record_error
+from app.agents.pdf_extractor import extract_pdf_text
+from app.agents.html_extractor import extract_text
+from app.agents.resolver import vet_url, avet_url, pinned_session
 
 # --- Helper: User Agents ---
-import socket
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
 # --- Helper: URL Validator (SSRF Protection) ---
 def is_safe_url(url: str) -> bool:
-    try:
-        parsed = urlparse(url)
-        hostname = parsed.hostname
-        if not hostname:
-            return False
-            
-        # Resolve to IP
-        ip = socket.gethostbyname(hostname)
-        
-        # Block Private IPs (Simple Check)
-        # 10.x.x.x, 192.168.x.x, 127.x.x.x, 172.16.x.x-172.31.x.x
-        parts = ip.split('.')
-        first = int(parts[0])
-        second = int(parts[1])
-        
-        if first == 127: return False # Localhost
-        if first == 10: return False # Private Class A
-        if first == 192 and second == 168: return False # Private Class C
-        if first == 172 and (16 <= second <= 31): return False # Private Class B
-        if ip == "0.0.0.0": return False
-        
-        return True
-    except:
-        return False
+    """
+    True if every address the URL's host resolves to is public (IPv4 and IPv6).
+    Answers are cached (DNS_CACHE_TTL) and the vetted address is pinned for the
+    download, so fetch_bounded() connects to exactly the IP checked here.
+    """
+    return vet_url(url) is not None
 
 # --- Helper: User Agents ---
 USER_AGENTS = [
@@ -44,6 +30,57 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
 ]
 
+# --- Concurrent scraping limits ---
+SCRAPE_MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", "8"))
+SCRAPE_DEADLINE = float(os.getenv("SCRAPE_DEADLINE", "15"))  # Seconds for the whole batch
+
+# --- Fetch cache (extracted text, shared by /research and the roundtable) ---
+fetch_cache = DiskCache(
+    "fetch_cache.sqlite3",
+    ttl=float(os.getenv("FETCH_CACHE_TTL", "86400")),
+    max_bytes=int(os.getenv("FETCH_CACHE_MAX_MB", "256")) * 1024 * 1024
+)
+
+# --- Download limits (streamed; bodies never exceed these caps in memory) ---
+PDF_MAX_BYTES = int(os.getenv("PDF_MAX_BYTES", str(25 * 1024 * 1024)))
+HTML_MAX_BYTES = int(os.getenv("HTML_MAX_BYTES", str(2 * 1024 * 1024)))
+FETCH_MAX_SECONDS = float(os.getenv("FETCH_MAX_SECONDS", "60"))  # Total time per download
+PDF_CONTENT_TYPES = {"application/pdf", "application/x-pdf", "application/octet-stream"}
+HTML_CONTENT_TYPES = {"text/html", "application/xhtml+xml", "text/plain"}
+
+# Downloads connect only to the address is_safe_url() vetted (keep-alive connections are reused)
+http_session = pinned_session()
+
+class FetchError(Exception):
+    """Raised when a download is rejected by its status, Content-Type or byte cap."""
+
+TRACKING_PARAMS = {"fbclid", "gclid", "ref", "ref_src"}
+
+def normalize_url(url: str) -> str:
+    """
+    Normalizes a URL so equivalent links share one cache entry.
+    Lowercases scheme/host, drops default ports, fragments, tracking params
+    and trailing slashes, and sorts the query string.
+    """
+    try:
+        parsed = urlparse(url.strip())
+        scheme = parsed.scheme.lower()
+        netloc = (parsed.hostname or "").lower()
+        port = parsed.port
+        if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+            netloc = f"{netloc}:{port}"
+        path = parsed.path or "/"
+        if len(path) > 1:
+            path = path.rstrip("/")
+        query = urlencode(sorted(
+            (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+            if not (k.lower().startswith("utm_") or k.lower() in TRACKING_PARAMS)
+        ))
+        return urlunparse((scheme, netloc, path, "", query, ""))
+    except ValueError:
+        return url.strip()
+
+@timed("tool")
 def search_web(query: str, max_results: int = 5):
     """
     Search the web using DuckDuckGo.
@@ -58,8 +95,10 @@ def search_web(query: str, max_results: int = 5):
             return [r for r in ddgs.text(query, max_results=max_results)]
     except Exception as e:
         print(f"Web search failed: {e}")
+        record_error()
         return []
 
+@timed("tool")
 def search_arxiv(query: str, max_results: int = 3):
     """
     Search Arxiv for papers.
@@ -90,8 +129,10 @@ def search_arxiv(query: str, max_results: int = 3):
         return results
     except Exception as e:
         print(f"Arxiv search failed: {e}")
+        record_error()
         return []
 
+@timed("tool")
 def fetch_hf_daily_papers(max_results: int = 10):
     """
     Fetch trending papers from the Hugging Face Daily Papers API.
@@ -127,58 +168,147 @@ def fetch_hf_daily_papers(max_results: int = 10):
         return results
     except Exception as e:
         print(f"HuggingFace daily papers fetch failed: {e}")
+        record_error()
         return []
 
-def read_pdf(url: str):
+def fetch_bounded(url: str, timeout: float, max_bytes: int, allowed_types: set, truncate: bool = True):
+    """
+    Stream a URL into memory without ever holding more than `max_bytes`.
+    Content-Type and Content-Length are checked before the body is read.
+    Args:
+        url (str): URL to download (must already be SSRF-checked; the vetted IP is used).
+        timeout (float): Connect/read timeout per socket operation.
+        max_bytes (int): Byte cap for the (decompressed) body.
+        allowed_types (set): Accepted MIME types; a missing header is accepted.
+        truncate (bool): Keep the first `max_bytes` (or what arrived within FETCH_MAX_SECONDS)
+            instead of failing when the body is larger (or slower).
+    Returns:
+        tuple: (body bytes, charset from the Content-Type header or None, complete).
+            complete is False when the download was cut off by FETCH_MAX_SECONDS; such a
+            body is usable but shouldn't be cached. A `max_bytes` cut is deterministic and counts as complete.
+    """
+    headers = {'User-Agent': random.choice(USER_AGENTS)}
+    # Disable redirects to prevent SSRF bypass via 30x to private IP
+    with http_session.get(url, headers=headers, timeout=timeout, allow_redirects=False, stream=True) as response:
+        response.raise_for_status()
+        if 300 <= response.status_code < 400:
+            # The (usually empty) redirect body isn't the page: fail instead of extracting/caching it
+            raise FetchError(f"Redirect ({response.status_code}) to {response.headers.get('Location', '?')} not followed")
+
+        raw_type = response.headers.get("Content-Type", "")
+        content_type = raw_type.split(";")[0].strip().lower()
+        if content_type and content_type not in allowed_types:
+            raise FetchError(f"Unexpected Content-Type '{content_type}'")
+
+        length = response.headers.get("Content-Length", "")
+        if not truncate and length.isdigit() and int(length) > max_bytes:
+            raise FetchError(f"Body too large ({int(length)} bytes > {max_bytes})")
+
+        body = bytearray()
+        complete = True
+        deadline = time.monotonic() + FETCH_MAX_SECONDS
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            body.extend(chunk)
+            if len(body) >= max_bytes:
+                if not truncate:
+                    raise FetchError(f"Body exceeds {max_bytes} bytes")
+                del body[max_bytes:]
+                break
+            if time.monotonic() > deadline:
+                if not truncate:
+                    raise FetchError(f"Download exceeded {FETCH_MAX_SECONDS}s")
+                complete = False
+                break
+
+        encoding = response.encoding if "charset=" in raw_type.lower() else None
+        return bytes(body), encoding, complete
+
+@timed("tool")
+def read_pdf(url: str) -> tuple[str, bool]:
     """
     Download and read a PDF file.
     Args:
         url (str): URL to the PDF.
     Returns:
-        str: Text content of the PDF.
+        tuple: (text content of the PDF, complete). complete is False for errors and for
+            extractions cut short by PDF_TIMEOUT; those are not cached and shouldn't be stored.
     """
     try:
+        cache_key = f"pdf:{normalize_url(url)}"
+        cached = fetch_cache.get(cache_key)
+        if cached is not None:
+            return cached, True
+
         if not is_safe_url(url):
-             return "Error: Security Block (Private/Local IP access denied)"
+             return "Error: Security Block (Private/Local IP access denied)", False
              
-        headers = {'User-Agent': random.choice(USER_AGENTS)}
-        # Disable redirects to prevent SSRF bypass via 30x to private IP
-        response = requests.get(url, headers=headers, timeout=15, allow_redirects=False)
-        response.raise_for_status()
-        
-        f = io.BytesIO(response.content)
-        reader = PdfReader(f)
+        # A truncated PDF can't be parsed, so oversized files are rejected outright
+        data, _, _ = fetch_bounded(url, 15, PDF_MAX_BYTES, PDF_CONTENT_TYPES, truncate=False)
         
-        text = ""
-        # Read first 10 pages max to save token context
-        for page in reader.pages[:10]:
-            text += page.extract_text() + "\n"
-            
-        return text[:50000] # Safety Cap
+        # Reads the first PDF_PAGE_BUDGET pages in a process pool, bounded by PDF_TIMEOUT
+        text, complete = extract_pdf_text(data)
+        text = text[:50000] # Safety Cap
+        if complete:
+            fetch_cache.set(cache_key, text)
+        return text, complete
     except Exception as e:
         print(f"PDF reading failed: {e}")
-        return f"Error reading PDF: {e}"
+        record_error()
+        return f"Error reading PDF: {e}", False
 
+@timed("tool")
 def scrape_web_content(url: str):
     """
     Scrape text from a general web page (for Reddit/Twitter analysis).
     """
     try:
+        cache_key = f"html:{normalize_url(url)}"
+        cached = fetch_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         if not is_safe_url(url):
              return "Error: Security Block (Private/Local IP access denied)"
 
-        headers = {'User-Agent': random.choice(USER_AGENTS)}
-        # Disable redirects to prevent SSRF bypass
-        response = requests.get(url, headers=headers, timeout=10, allow_redirects=False)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
+        data, encoding, complete = fetch_bounded(url, 10, HTML_MAX_BYTES, HTML_CONTENT_TYPES)
         
-        # Remove scripts/styles
-        for s in soup(["script", "style", "nav", "footer"]):
-            s.decompose()
-            
-        text = soup.get_text(separator=' ', strip=True)
-        return text[:20000]
+        # Streams the markup, dropping scripts/styles/nav/footer, and stops at 20k chars
+        text = extract_text(data, encoding, max_chars=20000)
+        if complete:  # A page cut off by the download deadline is used once, not cached
+            fetch_cache.set(cache_key, text)
+        return text
     except Exception as e:
+        record_error()
         return f"Error scraping web: {e}"
+
+async def scrape_many(urls: list, max_workers: int = SCRAPE_MAX_WORKERS, deadline: float = SCRAPE_DEADLINE):
+    """
+    Scrape several pages concurrently with a total deadline.
+    Each fetch runs in a worker thread, so the event loop stays free.
+    Hosts are resolved and vetted asynchronously first, so the threads hit the DNS cache.
+    Args:
+        urls (list): URLs to scrape.
+        max_workers (int): Max pages fetched at the same time.
+        deadline (float): Seconds to wait for the whole batch.
+    Returns:
+        dict: {url: text} for every page that finished before the deadline.
+    """
+    results = {}
+    if not urls:
+        return results
+
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def scrape(url):
+        async with semaphore:
+            await avet_url(url)
+            results[url] = await asyncio.to_thread(scrape_web_content, url)
+
+    tasks = [asyncio.create_task(scrape(url)) for url in urls]
+    _, pending = await asyncio.wait(tasks, timeout=deadline)
+    if pending:
+        # Stragglers keep running in their threads, but their results are discarded
+        for task in pending:
+            task.cancel()
+        print(f"--- Scraper: Deadline hit, dropped {len(pending)} slow page(s) ---")
+    return results
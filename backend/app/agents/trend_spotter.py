@@ -1,73 +1,106 @@
 from app.agents.tools import search_arxiv, search_web, fetch_hf_daily_papers
+from app.core.deduplication import check_is_duplicates_many
+import asyncio
+import os
 import random
+import time
+
+# Prefetched candidates are served for up to this long, then the pool is refetched
+TREND_POOL_TTL = float(os.getenv("TREND_POOL_TTL", "21600"))
 
 class TrendSpotter:
     """
     The 'Eyes' of the system. Finds trending AI topics from Arxiv, HuggingFace, etc.
     Enforces AI-only constraints.
+    Keeps a pool of prefetched, already-deduplicated candidates across cycles,
+    so sources are only queried again once the pool drains (or goes stale).
     """
-    
-    def find_trending_topic(self):
+
+    def __init__(self):
+        self.pool = []  # Fresh candidates, served from the end
+        self.pool_expires = 0.0
+        self._refill_lock = asyncio.Lock()
+
+    async def find_trending_topic(self):
         """
-        Scans Arxiv, HuggingFace Daily Papers, and Web for fresh AI topics.
-        Randomly alternates between HF and Arxiv as primary source.
+        Serves the next fresh topic from the candidate pool, refilling it when empty.
         Returns:
             dict: { "topic": str, "source": str, "origin_url": str, "summary": str } or None
         """
-        # Randomly pick which source to try first (50/50 split)
-        strategies = [self._try_huggingface, self._try_arxiv]
-        random.shuffle(strategies)
-        
-        # Try primary source, then fallback
-        for strategy in strategies:
-            result = strategy()
-            if result:
-                return result
-            
-        # Strategy 3: Web Search for "AI News" (Final Fallback)
-        print("--- Trend Spotter: Scanning AI News ---")
-        news = search_web("trending AI breakthroughs this week site:techcrunch.com OR site:venturebeat.com", max_results=3)
-        if news:
-            article = random.choice(news)
-            print(f"--- Trend Spotter: Found News '{article['title']}' ---")
-            return {
-                "topic": article['title'],
-                "source": "Web News",
-                "origin_url": article['href'],
-                "summary": article['body']
-            }
-            
-        return None
+        async with self._refill_lock:
+            if not self.pool or time.monotonic() >= self.pool_expires:
+                await self._refill()
+            if not self.pool:
+                return None
+            topic = self.pool.pop()
+        print(f"--- Trend Spotter: Serving '{topic['topic']}' from {topic['source']} ({len(self.pool)} left in pool) ---")
+        return topic
+
+    async def _refill(self):
+        """
+        Fetches HuggingFace Daily Papers and Arxiv together, drops duplicates in
+        one batched lookup and shuffles the rest (so sources stay mixed).
+        AI news is only fetched when neither source has anything fresh.
+        """
+        hf, arxiv = await asyncio.gather(
+            asyncio.to_thread(self._try_huggingface),
+            asyncio.to_thread(self._try_arxiv)
+        )
+        candidates = hf + arxiv
+        fresh = await self._fresh(candidates)
+        if not fresh:
+            fresh = await self._fresh(await asyncio.to_thread(self._try_news))
+        random.shuffle(fresh)
+        self.pool = fresh
+        self.pool_expires = time.monotonic() + TREND_POOL_TTL
+        print(f"--- Trend Spotter: Pool refilled with {len(fresh)} fresh topics ({len(candidates)} fetched) ---")
+
+    @staticmethod
+    async def _fresh(candidates: list) -> list:
+        # Listings come back every refill: new URLs of known papers are recorded so they match exactly next time
+        duplicates = await check_is_duplicates_many(
+            [(c["origin_url"], c["topic"], c["summary"]) for c in candidates], record_aliases=True
+        )
+        return [c for c, duplicate in zip(candidates, duplicates) if not duplicate]
 
     def _try_huggingface(self):
         """Fetch trending papers from HuggingFace Daily Papers."""
         print("--- Trend Spotter: Scanning HuggingFace Daily Papers ---")
         papers = fetch_hf_daily_papers(max_results=10)
-        if papers:
-            paper = random.choice(papers)
-            topic = f"Paper: {paper['title']}"
-            print(f"--- Trend Spotter: Found HF Paper '{topic}' (⬆ {paper['upvotes']}) ---")
-            return {
-                "topic": topic,
+        return [
+            {
+                "topic": f"Paper: {paper['title']}",
                 "source": "HuggingFace",
                 "origin_url": paper['pdf_url'],  # ArXiv PDF URL for dedup
                 "summary": paper['summary']
             }
-        return None
+            for paper in papers
+        ]
 
     def _try_arxiv(self):
         """Search ArXiv for recent AI/CL papers."""
         print("--- Trend Spotter: Scanning Arxiv ---")
         papers = search_arxiv("cat:cs.AI OR cat:cs.CL", max_results=5)
-        if papers:
-            paper = random.choice(papers)
-            topic = f"Paper: {paper['title']}"
-            print(f"--- Trend Spotter: Found Arxiv Paper '{topic}' ---")
-            return {
-                "topic": topic,
+        return [
+            {
+                "topic": f"Paper: {paper['title']}",
                 "source": "Arxiv",
                 "origin_url": paper['pdf_url'],
                 "summary": paper['summary']
             }
-        return None
+            for paper in papers
+        ]
 
+    def _try_news(self):
+        """Web Search for "AI News" (final fallback)."""
+        print("--- Trend Spotter: Scanning AI News ---")
+        news = search_web("trending AI breakthroughs this week site:techcrunch.com OR site:venturebeat.com", max_results=3)
+        return [
+            {
+                "topic": article['title'],
+                "source": "Web News",
+                "origin_url": article['href'],
+                "summary": article['body']
+            }
+            for article in news
+        ]
@@ -1,17 +1,15 @@
+import asyncio
 from typing import List, Dict
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-from app.core.config import get_settings
+from app.core.metrics import track
+from app.core.llm_gateway import lazy_llm
 from app.agents.tools import search_arxiv, read_pdf, search_web, scrape_web_content
-
-settings = get_settings()
+from app.agents.retrieval import PDF_CONTEXT_TOKENS, SOCIAL_CONTEXT_TOKENS, select_passages
+from app.agents.artifacts import artifact_store, artifact_key, Unstored
 
 # We use Gemini 3 Flash Preview
-llm = ChatGoogleGenerativeAI(
-    model="gemini-3-flash-preview", 
-    google_api_key=settings.GOOGLE_API_KEY,
-    temperature=0.7
-)
+# (built on first use, see LazyLLM)
+worker_llm = lazy_llm("gemini-3-flash-preview", temperature=0.7, cache_node="worker")  # Opt-in via LLM_CACHE_NODES
 
 class WorkerNode:
     """
@@ -23,10 +21,16 @@ class WorkerNode:
         self.style = identity['style']
         self.backstory = identity.get('backstory', '')
         
-    def generate_response(self, valid_tools: List[str], discussion_history: str, context_data: Dict):
+    async def generate_response(self, valid_tools: List[str], discussion_history: str, context_data: Dict):
         """
         Generates a reply based on the agent's persona and the current discussion.
+        Blocking tools run in worker threads so concurrent agents don't stall the event loop.
+        Each turn is timed per role for /metrics.
         """
+        with track("worker", self.role):
+            return await self._respond(valid_tools, discussion_history, context_data)
+
+    async def _respond(self, valid_tools: List[str], discussion_history: str, context_data: Dict):
         
         # 1. System Prompt Construction
         system_prompt = f"""You are {self.name}, a {self.role}.
@@ -65,23 +69,41 @@ Think step-by-step internally, but output ONLY your natural dialogue."""
         if self.role == "Researcher":
              # Researcher proactively checks Arxiv/PDFs if not already present
              if "pdf_text" not in context_data:
-                 print(f"--- {self.name}: Reading PDF... ---")
                  # Check if we have an origin URL found by TrendSpotter
                  url = context_data.get("origin_url")
-                 if url and "arxiv.org/pdf" in url:
-                     pdf_content = read_pdf(url)
+                 topic = context_data.get("topic", "")
+                 if context_data.get("research_brief"):
+                     # Already researched (e.g. by /research): reuse the brief instead of re-reading the paper,
+                     # held to the same budget as the paper's passages
+                     context_data["pdf_text"] = ""
+                     brief = select_passages(context_data["research_brief"], topic, PDF_CONTEXT_TOKENS)
+                     has_new_info = f"I have studied this paper. Here is my research brief:\n{brief}"
+                 elif url and "arxiv.org/pdf" in url:
+                     # Extracted once per paper, shared with /research through the artifact store
+                     async def read():
+                         text, complete = await asyncio.to_thread(read_pdf, url)
+                         if text.startswith("Error"):
+                             return None
+                         return text if complete else Unstored(text)  # Timed-out pages: use it this turn only
+                     print(f"--- {self.name}: Reading PDF... ---")
+                     key = context_data.get("artifact_key") or artifact_key(url, topic)
+                     pdf_content = await artifact_store.get_or_create(key, "pdf_text", read) or ""
                      context_data["pdf_text"] = pdf_content # Cache it
-                     has_new_info = f"I have read the paper. Here is the technical content:\n{pdf_content[:15000]}..."
+                     if pdf_content:
+                         # The paper's most relevant passages (BM25 over its chunks), not just its first pages
+                         passages = select_passages(pdf_content, topic, PDF_CONTEXT_TOKENS)
+                         has_new_info = f"I have read the paper. Here are the key technical passages:\n{passages}"
                  
         elif self.role == "Analyst":
             if "social_sentiment" not in context_data:
                 print(f"--- {self.name}: Checking Social Sentiment... ---")
                 topic = context_data.get("topic", "")
-                reddit_res = search_web(f"{topic} site:reddit.com", 3)
+                reddit_res = await asyncio.to_thread(search_web, f"{topic} site:reddit.com", 3)
                 if reddit_res:
                     # Scrape the first result
-                    content = scrape_web_content(reddit_res[0]['href'])
-                    has_new_info = f"I checked {reddit_res[0]['href']}. Community says:\n{content[:5000]}..."
+                    content = await asyncio.to_thread(scrape_web_content, reddit_res[0]['href'])
+                    passages = select_passages(content, topic, SOCIAL_CONTEXT_TOKENS)
+                    has_new_info = f"I checked {reddit_res[0]['href']}. Community says:\n{passages}"
                     context_data["social_sentiment"] = "Checked"
 
         # 3. Generate Output
@@ -95,7 +117,7 @@ Think step-by-step internally, but output ONLY your natural dialogue."""
         Your turn. Reply to the group.
         """
         
-        response = llm.invoke([
+        response = await worker_llm.ainvoke([
             SystemMessage(content=system_prompt), 
             HumanMessage(content=user_prompt)
         ])
@@ -0,0 +1,124 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Directory for every on-disk cache/store (mounted or chowned in Docker)
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+
+def cache_path(filename: str) -> str:
+    """Returns the path of a file inside CACHE_DIR, creating the directory if needed."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, filename)
+
+class DiskCache:
+    """
+    Persistent key/value cache backed by SQLite.
+    - Keys are hashed (sha256), so any string can be used as a key.
+    - Entries expire after `ttl` seconds.
+    - When the stored values exceed `max_bytes`, least recently used entries are evicted.
+    - Hit/miss counters are kept per process.
+    """
+
+    def __init__(self, filename: str, ttl: float, max_bytes: int):
+        self.filename = filename
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened lazily so importing a module that owns a cache never touches the disk
+        if self._conn is None:
+            self._conn = sqlite3.connect(cache_path(self.filename), check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_idx ON entries(accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        """Returns the cached value, or None if missing/expired."""
+        digest = self._hash(key)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (digest,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl:
+                conn.execute("DELETE FROM entries WHERE key = ?", (digest,))
+                conn.commit()
+                self.misses += 1
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, digest))
+            conn.commit()
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        """Stores a value and evicts LRU entries if the cache is over its size budget."""
+        digest = self._hash(key)
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return  # Would evict everything else, not worth caching
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (digest, value, size, now, now)
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+
+    def clear(self):
+        """Removes every entry."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current size."""
+        with self._lock:
+            conn = self._connect()
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+        }
@@ -1,9 +1,27 @@
+import asyncio
+import os
 import re
-from app.services.supabase_client import get_supabase
-from app.core.config import get_settings
+import threading
+import weakref
+import zlib
+import numpy as np
+from app.services.supabase_client import get_supabase, get_async_supabase
+from app.core.embeddings import VectorIndex, get_embedder
 
-settings = get_settings()
-supabase = get_supabase()
+DEDUP_SYNC_INTERVAL = float(os.getenv("DEDUP_SYNC_INTERVAL", "300"))  # Seconds between delta syncs
+SYNC_PAGE_SIZE = 1000
+
+# Near-duplicate detection (MinHash + LSH over character shingles)
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.7"))  # Estimated Jaccard similarity
+MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "64"))
+SHINGLE_SIZE = 5
+SUMMARY_SHINGLE_CHARS = 1000  # Only the start of a summary is shingled
+_MERSENNE_PRIME = (1 << 31) - 1
+
+# Semantic dedup (DEDUP_EMBEDDER): cosine similarity against a local vector index,
+# then the match_documents RPC for anything the local index doesn't know
+SEMANTIC_DUP_THRESHOLD = float(os.getenv("SEMANTIC_DUP_THRESHOLD", "0.9"))
+SEMANTIC_DEDUP_RPC = os.getenv("SEMANTIC_DEDUP_RPC", "true").lower() == "true"
 
 def extract_arxiv_id(url: str) -> str | None:
     """
@@ -11,18 +29,16 @@ def extract_arxiv_id(url: str) -> str | None:
     Examples:
       - https://arxiv.org/abs/2401.12345 -> 2401.12345
       - https://arxiv.org/pdf/2401.12345.pdf -> 2401.12345
+      - http://arxiv.org/pdf/2401.12345v1 -> 2401.12345
     """
     patterns = [
-        r'arxiv\.org/abs/(\d{4}\.\d{4,5}(?:v\d+)?)',
-        r'arxiv\.org/pdf/(\d{4}\.\d{4,5}(?:v\d+)?)\.pdf',
-        r'arxiv:(\d{4}\.\d{4,5}(?:v\d+)?)',
+        r'arxiv\.org/(?:abs|pdf)/(\d{4}\.\d{4,5})(?:v\d+)?(?:\.pdf)?',
+        r'arxiv:(\d{4}\.\d{4,5})(?:v\d+)?',
     ]
     for pattern in patterns:
         match = re.search(pattern, url)
         if match:
-            # Strip version number (e.g., v1, v2) for dedup
-            arxiv_id = match.group(1)
-            return re.sub(r'v\d+$', '', arxiv_id)
+            return match.group(1)  # Without the version (v1, v2): all versions are one paper
     return None
 
 def normalize_title(title: str) -> str:
@@ -35,66 +51,409 @@ def normalize_title(title: str) -> str:
     # Lowercase and strip
     return title.lower().strip()
 
-async def check_is_duplicate(url: str, title: str) -> bool:
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Character shingles of `text` after lowercasing and collapsing punctuation/whitespace."""
+    text = re.sub(r'\W+', ' ', text.lower()).strip()
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def _lsh_params(threshold: float, num_perm: int) -> tuple:
+    """
+    Picks (bands, rows) so the LSH S-curve midpoint (1/bands)^(1/rows) sits
+    just below `threshold`: candidates are over-collected, then verified.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        if midpoint <= threshold:
+            best = (bands, rows)
+    return best
+
+class MinHashLSH:
+    """
+    MinHash signatures with an LSH banding index.
+    Queries only compare against items sharing at least one band bucket,
+    so lookup cost stays roughly flat as the index grows.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUP_THRESHOLD, num_perm: int = MINHASH_PERMUTATIONS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.threshold = threshold
+        self.bands, self.rows = _lsh_params(threshold, num_perm)
+        self.buckets = [{} for _ in range(self.bands)]
+        self.labels = []
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._lock = threading.Lock()
+
+    def signature(self, shingle_set: set) -> np.ndarray | None:
+        """MinHash signature of a shingle set (None if empty)."""
+        if not shingle_set:
+            return None
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) & _MERSENNE_PRIME for s in shingle_set),
+            dtype=np.uint64, count=len(shingle_set)
+        )
+        # (a * h + b) mod p for every permutation/shingle pair, min per permutation
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % _MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list:
+        r = self.rows
+        return [hash(signature[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+
+    def add(self, label: str, signature: np.ndarray):
+        with self._lock:
+            row = len(self.labels)
+            if row == len(self._signatures):
+                self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+            self._signatures[row] = signature
+            self.labels.append(label)
+            for bucket, key in zip(self.buckets, self._band_keys(signature)):
+                bucket.setdefault(key, []).append(row)
+
+    def query(self, signature: np.ndarray) -> tuple | None:
+        """Returns (label, estimated similarity) of the closest item at/above threshold, or None."""
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self.buckets, self._band_keys(signature)):
+                candidates.update(bucket.get(key, ()))
+            if not candidates:
+                return None
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarities = (self._signatures[rows] == signature).mean(axis=1)
+            best = int(similarities.argmax())
+            if similarities[best] < self.threshold:
+                return None
+            return self.labels[rows[best]], float(similarities[best])
+
+class DedupIndex:
+    """
+    In-memory copy of the keys dedup compares against:
+    normalized titles (known_items + threads), URLs and Arxiv IDs.
+    Warmed once from Supabase, then kept current by local writes
+    and periodic delta syncs on `created_at`.
+    Near-duplicates are found with two MinHash/LSH views: titles alone
+    (available for every stored row) and title + summary (for items seen
+    by this process, since known_items has no summary column).
+    """
+
+    def __init__(self):
+        self.titles = set()
+        self.urls = set()
+        self.arxiv_ids = set()
+        self.title_lsh = MinHashLSH()
+        self.document_lsh = MinHashLSH()
+        self.warmed = False
+        # Newest created_at seen per table; the next sync only pulls rows from there on
+        self._cursors = {"known_items": None, "threads": None}
+        self._lock = threading.Lock()
+
+    def add(self, url: str | None = None, title: str | None = None, arxiv_id: str | None = None, summary: str = ""):
+        """Records an item locally (no network)."""
+        normalized = normalize_title(title) if title else ""
+        with self._lock:
+            if url:
+                self.urls.add(url)
+                arxiv_id = arxiv_id or extract_arxiv_id(url)
+            if arxiv_id:
+                self.arxiv_ids.add(arxiv_id)
+            if not normalized:
+                return
+            new_title = normalized not in self.titles
+            self.titles.add(normalized)
+
+        title_signature = self.title_lsh.signature(shingles(normalized)) if new_title else None
+        if title_signature is not None:
+            self.title_lsh.add(normalized, title_signature)
+        if summary:
+            document = f"{normalized} {summary[:SUMMARY_SHINGLE_CHARS]}"
+            self.document_lsh.add(normalized, self.document_lsh.signature(shingles(document)))
+
+    def match(self, url: str, title: str, summary: str = "") -> str | None:
+        """Returns the reason an item is a duplicate, or None. No round trips."""
+        arxiv_id = extract_arxiv_id(url)
+        normalized = normalize_title(title)
+        with self._lock:
+            if arxiv_id and arxiv_id in self.arxiv_ids:
+                return f"Arxiv ID: {arxiv_id}"
+            if url in self.urls:
+                return "URL in known_items"
+            if normalized in self.titles:
+                return f"title: {title}"
+
+        title_signature = self.title_lsh.signature(shingles(normalized))
+        if title_signature is not None:
+            near = self.title_lsh.query(title_signature)
+            if near:
+                return f"near-duplicate title ({near[1]:.2f}): {near[0]}"
+        if summary:
+            document = f"{normalized} {summary[:SUMMARY_SHINGLE_CHARS]}"
+            near = self.document_lsh.query(self.document_lsh.signature(shingles(document)))
+            if near:
+                return f"near-duplicate title + summary ({near[1]:.2f}): {near[0]}"
+        return None
+
+    def _fetch_since(self, table: str, columns: str) -> list:
+        """Pages through every row of `table` created at/after its cursor."""
+        rows = []
+        start = 0
+        cursor = self._cursors[table]
+        supabase = get_supabase()
+        while True:
+            query = supabase.table(table).select(columns)
+            if cursor:
+                # gte, not gt: rows sharing the cursor timestamp are re-read, sets absorb the overlap
+                query = query.gte("created_at", cursor)
+            page = query.order("created_at").range(start, start + SYNC_PAGE_SIZE - 1).execute().data or []
+            rows.extend(page)
+            if len(page) < SYNC_PAGE_SIZE:
+                return rows
+            start += SYNC_PAGE_SIZE
+
+    def sync(self):
+        """Pulls rows created since the last sync (everything on the first call)."""
+        items = self._fetch_since("known_items", "url, title, arxiv_id, created_at")
+        for item in items:
+            self.add(item.get("url"), item.get("title"), item.get("arxiv_id"))
+
+        threads = self._fetch_since("threads", "topic_title, created_at")
+        for thread in threads:
+            self.add(title=thread.get("topic_title"))
+
+        with self._lock:
+            if items:
+                self._cursors["known_items"] = items[-1]["created_at"]
+            if threads:
+                self._cursors["threads"] = threads[-1]["created_at"]
+        return len(items) + len(threads)
+
+    def warm(self):
+        """Initial full load. Safe to call again; later calls are delta syncs."""
+        count = self.sync()
+        self.warmed = True
+        print(f"--- Dedup index warmed: {len(self.titles)} titles, {len(self.urls)} URLs, {len(self.arxiv_ids)} Arxiv IDs ({count} rows) ---", flush=True)
+
+dedup_index = DedupIndex()
+# Embeddings of items marked seen by this process; a cache in front of match_documents
+semantic_index = VectorIndex()
+
+def _document(title: str, summary: str = "") -> str:
+    """Text embedded for semantic dedup."""
+    return f"{normalize_title(title)} {summary[:SUMMARY_SHINGLE_CHARS]}".strip()
+
+def _to_pgvector(vector: np.ndarray) -> list:
+    return np.round(vector.astype(np.float64), 6).tolist()
+
+async def _match_documents(vector: np.ndarray) -> str | None:
+    """Closest known_items row by embedding (match_documents RPC), as a duplicate reason."""
+    try:
+        async_supabase = await get_async_supabase()
+        response = await async_supabase.rpc("match_documents", {
+            "query_embedding": _to_pgvector(vector),
+            "match_threshold": SEMANTIC_DUP_THRESHOLD,
+            "match_count": 1
+        }).execute()
+    except Exception as e:
+        print(f"match_documents failed: {e}", flush=True)
+        return None
+    rows = response.data or []
+    return f"semantic match ({rows[0]['similarity']:.2f}): known item {rows[0]['id']}" if rows else None
+
+async def _semantic_matches(items: list) -> tuple:
+    """
+    Semantic duplicate reasons for (url, title, summary) items, embedded in one batch.
+    Each item costs one row of a matrix product against the local index;
+    only local misses go to the match_documents RPC.
+    Returns:
+        tuple: (reason or None per item, normalized embeddings or None if semantic dedup is off/failed)
+    """
+    embedder = get_embedder()
+    if embedder is None or not items:
+        return [None] * len(items), None
+    try:
+        vectors = await embedder.embed_many([_document(title, summary) for _, title, summary in items])
+    except Exception as e:
+        print(f"Embedding failed, skipping semantic dedup: {e}", flush=True)
+        return [None] * len(items), None
+
+    reasons = [
+        f"semantic match ({near[1]:.2f}): {near[0]}" if near else None
+        for near in semantic_index.query_many(vectors, SEMANTIC_DUP_THRESHOLD)
+    ]
+    if SEMANTIC_DEDUP_RPC:
+        misses = [i for i, reason in enumerate(reasons) if reason is None]
+        remote = await asyncio.gather(*(_match_documents(vectors[i]) for i in misses))
+        for i, reason in zip(misses, remote):
+            reasons[i] = reason
+    return reasons, vectors
+
+async def warm_dedup_index():
+    """Loads the dedup index off the event loop."""
+    await asyncio.to_thread(dedup_index.warm)
+
+async def run_dedup_sync_loop():
+    """Background task: delta-syncs rows written by other processes (ingestion, other replicas)."""
+    while True:
+        await asyncio.sleep(DEDUP_SYNC_INTERVAL)
+        try:
+            await asyncio.to_thread(dedup_index.sync)
+        except Exception as e:
+            print(f"Dedup index sync failed: {e}", flush=True)
+
+def record_thread(title: str):
+    """Call after inserting a thread so its title is deduped without waiting for a sync."""
+    dedup_index.add(title=title)
+
+async def check_is_duplicate(url: str, title: str, summary: str = "") -> bool:
     """
     Returns True if item is a duplicate.
-    Checks:
+    Checks (against the local index, no round trips):
       1. Arxiv ID match (most reliable for papers)
       2. Exact URL match in known_items
-      3. Title match in known_items (normalized)
-      4. Title match in threads (normalized)
+      3. Title match in known_items / threads (normalized)
+      4. Near-duplicate title, or title + summary (MinHash/LSH)
+      5. Semantic match (embeddings; local vector index, then match_documents), if DEDUP_EMBEDDER is set
     """
     try:
-        # 1. Arxiv ID check (most reliable)
-        arxiv_id = extract_arxiv_id(url)
-        if arxiv_id:
-            response = supabase.table("known_items").select("id").eq("arxiv_id", arxiv_id).execute()
-            if response.data and len(response.data) > 0:
-                print(f"--- Duplicate found by Arxiv ID: {arxiv_id} ---", flush=True)
-                return True
-        
-        # 2. Check known_items by URL
-        response = supabase.table("known_items").select("id").eq("url", url).execute()
-        if response.data and len(response.data) > 0:
-            print(f"--- Duplicate found by URL in known_items ---", flush=True)
+        if not dedup_index.warmed:
+            await warm_dedup_index()
+
+        reason = dedup_index.match(url, title, summary)
+        if reason is None:
+            reason = (await _semantic_matches([(url, title, summary)]))[0][0]
+        if reason:
+            print(f"--- Duplicate found by {reason} ---", flush=True)
             return True
-        
-        # 3. Check known_items by normalized title
-        normalized = normalize_title(title)
-        title_response = supabase.table("known_items").select("id, title").execute()
-        for item in title_response.data or []:
-            if normalize_title(item.get("title", "")) == normalized:
-                print(f"--- Duplicate found by title in known_items: {title} ---", flush=True)
-                return True
-        
-        # 4. Check threads table by normalized title
-        thread_response = supabase.table("threads").select("id, topic_title").execute()
-        for thread in thread_response.data or []:
-            if normalize_title(thread.get("topic_title", "")) == normalized:
-                print(f"--- Duplicate found by title in threads: {title} ---", flush=True)
-                return True
-            
         return False
         
     except Exception as e:
         print(f"Deduplication check failed: {e}", flush=True)
         return False
 
-async def mark_as_seen(url: str, title: str):
+async def check_is_duplicates_many(items: list, record_aliases: bool = False) -> list:
     """
-    Adds item to known_items for future deduplication.
-    Stores URL, title, and Arxiv ID if available.
+    Batched check_is_duplicate: one index warm-up check and one embedding
+    call for the whole batch. Items are also checked against each other, so
+    the same paper listed by two sources is kept only once (the first
+    occurrence wins).
+    Args:
+        items (list): (url, title, summary) tuples.
+        record_aliases (bool): Also mark as seen, in one batch, duplicates of known
+            items whose URL isn't stored yet, so they match exactly next time.
+    Returns:
+        list: True for each duplicate, in input order.
     """
     try:
-        arxiv_id = extract_arxiv_id(url)
-        data = {
-            "url": url,
-            "title": title
-        }
-        if arxiv_id:
-            data["arxiv_id"] = arxiv_id
-            
-        supabase.table("known_items").insert(data).execute()
-        print(f"--- Marked as seen: {title} (arxiv_id: {arxiv_id}) ---", flush=True)
+        if not dedup_index.warmed:
+            await warm_dedup_index()
+
+        batch = DedupIndex()  # Local only: items accepted so far in this batch
+        reasons = []
+        for url, title, summary in items:
+            reason = dedup_index.match(url, title, summary)
+            if reason is None:
+                reason = batch.match(url, title, summary)
+                reason = f"{reason} (same batch)" if reason else None
+            if reason is None:
+                batch.add(url, title, summary=summary)
+            reasons.append(reason)
+
+        # Semantic pass over what survived the lexical checks
+        survivors = [i for i, reason in enumerate(reasons) if reason is None]
+        semantic, vectors = await _semantic_matches([items[i] for i in survivors])
+        batch_vectors = VectorIndex()
+        for k, i in enumerate(survivors):
+            reason = semantic[k]
+            if reason is None and vectors is not None:
+                near = batch_vectors.query_many(vectors[k:k + 1], SEMANTIC_DUP_THRESHOLD)[0]
+                if near:
+                    reason = f"semantic match ({near[1]:.2f}): {near[0]} (same batch)"
+                else:
+                    batch_vectors.add_many([normalize_title(items[i][1])], vectors[k:k + 1])
+            reasons[i] = reason
+
+        for reason in filter(None, reasons):
+            print(f"--- Duplicate found by {reason} ---", flush=True)
+        if record_aliases:
+            await mark_many_as_seen([
+                item for item, reason in zip(items, reasons)
+                if reason and not reason.endswith("(same batch)") and item[0] and item[0] not in dedup_index.urls
+            ])
+        return [reason is not None for reason in reasons]
+
     except Exception as e:
-        print(f"Failed to mark item as seen: {e}", flush=True)
+        print(f"Batched deduplication check failed: {e}", flush=True)
+        return [False] * len(items)
+
+async def mark_many_as_seen(items: list):
+    """
+    Adds items to known_items for future deduplication: one embedding call and
+    one bulk upsert for the whole batch.
+    Stores URL, title, and Arxiv ID if available, and the embedding if
+    semantic dedup is on (usually memoized from the duplicate check).
+    Args:
+        items (list): (url, title, summary) tuples.
+    """
+    if not items:
+        return
+    try:
+        rows = {}  # url -> row (url is unique in known_items)
+        for url, title, summary in items:
+            arxiv_id = extract_arxiv_id(url)
+            # Index first: the item counts as seen even if the insert fails
+            dedup_index.add(url, title, arxiv_id, summary)
+            row = {"url": url, "title": title, "arxiv_id": arxiv_id}
+            rows.setdefault(url, row)
+
+        embedder = get_embedder()
+        if embedder is not None:
+            try:
+                vectors = await embedder.embed_many([_document(title, summary) for _, title, summary in items])
+                semantic_index.add_many([normalize_title(title) for _, title, _ in items], vectors)
+                for (url, _, _), vector in zip(items, vectors):
+                    rows[url].setdefault("embedding", _to_pgvector(vector))
+            except Exception as e:
+                print(f"Embedding failed, storing items without one: {e}", flush=True)
+
+        async_supabase = await get_async_supabase()
+        # Rows whose URL is already stored are skipped instead of failing the batch
+        await async_supabase.table("known_items").upsert(
+            list(rows.values()), on_conflict="url", ignore_duplicates=True
+        ).execute()
+        for url, title, _ in items:
+            print(f"--- Marked as seen: {title} (arxiv_id: {extract_arxiv_id(url)}) ---", flush=True)
+    except Exception as e:
+        print(f"Failed to mark {len(items)} item(s) as seen: {e}", flush=True)
+
+class _SeenWriter:
+    """
+    Group commit for mark_as_seen: while one batch is being written, callers
+    queue up, and the next one to get the lock writes everything queued.
+    Jobs finishing together (e.g. an ingestion burst) share one embedding call
+    and one upsert; a lone call is written straight away.
+    """
+
+    def __init__(self):
+        self.pending = []
+        self.lock = asyncio.Lock()
+
+    async def mark(self, item: tuple):
+        self.pending.append(item)
+        async with self.lock:
+            if not self.pending:
+                return  # Written by the batch of a caller ahead of us
+            batch, self.pending = self.pending, []
+            await mark_many_as_seen(batch)
+
+_seen_writers = weakref.WeakKeyDictionary()  # Event loop -> _SeenWriter (asyncio locks are per loop)
+
+async def mark_as_seen(url: str, title: str, summary: str = ""):
+    """Adds one item to known_items, batched with concurrent calls (see mark_many_as_seen)."""
+    loop = asyncio.get_running_loop()
+    writer = _seen_writers.get(loop)
+    if writer is None:
+        writer = _seen_writers[loop] = _SeenWriter()
+    await writer.mark((url, title, summary))
@@ -0,0 +1,159 @@
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
+import numpy as np
+from app.core.config import get_settings
+from app.core.metrics import track
+
+# Embedder for semantic dedup: "gemini", "hashing" (deterministic, offline) or "" (off).
+# Keep one embedder per database: known_items.embedding rows are only comparable to their own kind.
+DEDUP_EMBEDDER = os.getenv("DEDUP_EMBEDDER", "").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/gemini-embedding-001")
+EMBEDDING_DIMENSIONS = 3072  # known_items.embedding is vector(3072)
+EMBEDDING_CACHE_SIZE = 4096  # Texts whose embeddings are memoized (a check's vectors are reused by mark_as_seen)
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalizes each row (as float32) so a dot product is the cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+class HashingEmbedder:
+    """
+    Deterministic local embedder: word unigrams and bigrams hashed (CRC32, signed)
+    into EMBEDDING_DIMENSIONS buckets. No network or model download; close to a
+    bag-of-words cosine, so it catches rewordings that share most terms.
+    """
+    name = "hashing"
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> np.ndarray:
+        words = re.findall(r"\w+", text.lower())
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        return vector
+
+    async def embed_documents(self, texts: list) -> np.ndarray:
+        return np.stack([self._embed(text) for text in texts])
+
+class GeminiEmbedder:
+    """Gemini embeddings (EMBEDDING_MODEL), one API request per batch of up to 100 texts."""
+    name = "gemini"
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dimensions: int = EMBEDDING_DIMENSIONS):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        self.dimensions = dimensions
+        self.client = GoogleGenerativeAIEmbeddings(model=model, google_api_key=get_settings().GOOGLE_API_KEY)
+
+    async def embed_documents(self, texts: list) -> np.ndarray:
+        vectors = await self.client.aembed_documents(
+            texts, task_type="SEMANTIC_SIMILARITY", output_dimensionality=self.dimensions
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+EMBEDDERS = {"hashing": HashingEmbedder, "gemini": GeminiEmbedder}
+
+class CachedEmbedder:
+    """
+    Batches and memoizes an embedder: only texts not seen recently are sent,
+    all in one call. Returned rows are L2-normalized float32.
+    """
+
+    def __init__(self, embedder, max_entries: int = EMBEDDING_CACHE_SIZE):
+        self.embedder = embedder
+        self.name = embedder.name
+        self.dimensions = embedder.dimensions
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def embed_many(self, texts: list) -> np.ndarray:
+        """
+        Embeds `texts` in one batch.
+        Args:
+            texts (list): Documents to embed.
+        Returns:
+            np.ndarray: (len(texts), dimensions) normalized float32 matrix.
+        """
+        with self._lock:
+            vectors = {}
+            for text in dict.fromkeys(texts):
+                if text in self._cache:
+                    self._cache.move_to_end(text)
+                    vectors[text] = self._cache[text]
+        missing = [text for text in dict.fromkeys(texts) if text not in vectors]
+        if missing:
+            with track("embedding", self.name):
+                fresh = dict(zip(missing, normalize_rows(await self.embedder.embed_documents(missing))))
+            vectors.update(fresh)
+            with self._lock:
+                self._cache.update(fresh)
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        if not texts:
+            return np.empty((0, self.dimensions), dtype=np.float32)
+        return np.stack([vectors[text] for text in texts])
+
+@lru_cache(maxsize=None)
+def get_embedder() -> CachedEmbedder | None:
+    """The configured dedup embedder (DEDUP_EMBEDDER), or None if semantic dedup is off."""
+    if not DEDUP_EMBEDDER:
+        return None
+    if DEDUP_EMBEDDER not in EMBEDDERS:
+        print(f"Unknown DEDUP_EMBEDDER '{DEDUP_EMBEDDER}', semantic dedup disabled", flush=True)
+        return None
+    return CachedEmbedder(EMBEDDERS[DEDUP_EMBEDDER]())
+
+class VectorIndex:
+    """
+    Brute-force cosine index over a normalized float32 matrix.
+    A query is one matrix-vector product (a batch, one matrix-matrix product),
+    which beats an ANN structure at the few thousand items dedup holds.
+    """
+
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.labels = []
+        self._matrix = np.empty((256, dimensions), dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add_many(self, labels: list, vectors: np.ndarray):
+        """Adds normalized rows (see normalize_rows) under `labels`."""
+        with self._lock:
+            start = len(self.labels)
+            needed = start + len(labels)
+            if needed > len(self._matrix):
+                grown = np.empty((max(needed, 2 * len(self._matrix)), self._matrix.shape[1]), dtype=np.float32)
+                grown[:start] = self._matrix[:start]
+                self._matrix = grown
+            self._matrix[start:needed] = vectors
+            self.labels.extend(labels)
+
+    def query_many(self, vectors: np.ndarray, threshold: float) -> list:
+        """
+        Nearest stored item for each normalized query row.
+        Args:
+            vectors (np.ndarray): (n, dimensions) normalized queries.
+            threshold (float): Minimum cosine similarity.
+        Returns:
+            list: (label, similarity) or None per query.
+        """
+        with self._lock:
+            count = len(self.labels)
+            if not count or not len(vectors):
+                return [None] * len(vectors)
+            similarities = vectors @ self._matrix[:count].T
+            best = similarities.argmax(axis=1)
+            return [
+                (self.labels[j], float(similarities[i, j])) if similarities[i, j] >= threshold else None
+                for i, j in enumerate(best)
+            ]
@@ -0,0 +1,28 @@
+from langchain_google_genai import ChatGoogleGenerativeAI
+from app.core.llm_gateway import gateway
+
+# Kept apart from llm_gateway: importing the Gemini SDK is the slowest part of startup,
+# so it only happens when get_llm() builds the first model.
+
+class GatewayChatModel(ChatGoogleGenerativeAI):
+    """
+    Gemini chat model whose async calls go through the shared gateway.
+    Cache hits (llm_cache) never reach _agenerate, so they cost no quota.
+    Streamed calls (ainvoke under astream_events) are gated through _astream.
+    Sync calls are not gated; the pipeline only uses ainvoke.
+    """
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await gateway.call(
+            self.model.removeprefix("models/"),
+            messages,
+            lambda: super(GatewayChatModel, self)._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async for chunk in gateway.stream(
+            self.model.removeprefix("models/"),
+            messages,
+            lambda: super(GatewayChatModel, self)._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+        ):
+            yield chunk
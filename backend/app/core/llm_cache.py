@@ -0,0 +1,71 @@
+import json
+import os
+from langchain_core.caches import BaseCache
+from langchain_core.messages import messages_from_dict, messages_to_dict
+from langchain_core.outputs import ChatGeneration, Generation
+from app.core.cache import DiskCache
+
+# Nodes whose LLM calls may be served from cache (comma-separated). Off unless set,
+# e.g. LLM_CACHE_NODES=self_reflect,critic.
+# Known names: self_reflect, critic (graph.py), worker (workers.py), personas (manager.py)
+LLM_CACHE_NODES = {n.strip() for n in os.getenv("LLM_CACHE_NODES", "").split(",") if n.strip()}
+
+class DiskLLMCache(BaseCache):
+    """
+    LangChain response cache stored in a DiskCache (TTL + LRU).
+    LangChain passes `llm_string` (model, temperature and other params)
+    with every prompt, so the key is effectively model + temperature + prompt hash.
+    """
+
+    def __init__(self, disk: DiskCache):
+        self.disk = disk
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return f"{llm_string}\n{prompt}"
+
+    def lookup(self, prompt: str, llm_string: str):
+        value = self.disk.get(self._key(prompt, llm_string))
+        if value is None:
+            return None
+        try:
+            entries = json.loads(value)
+            generations = []
+            for entry in entries:
+                if "message" in entry:
+                    generations.append(ChatGeneration(message=messages_from_dict([entry["message"]])[0]))
+                else:
+                    generations.append(Generation(text=entry["text"]))
+            return generations
+        except (ValueError, KeyError, TypeError):
+            return None  # Unreadable entry: treat as a miss
+
+    def update(self, prompt: str, llm_string: str, return_val):
+        entries = []
+        for generation in return_val:
+            if isinstance(generation, ChatGeneration):
+                entries.append({"message": messages_to_dict([generation.message])[0]})
+            else:
+                entries.append({"text": generation.text})
+        self.disk.set(self._key(prompt, llm_string), json.dumps(entries))
+
+    def clear(self, **kwargs):
+        self.disk.clear()
+
+    def stats(self) -> dict:
+        return self.disk.stats()
+
+llm_cache = DiskLLMCache(DiskCache(
+    "llm_cache.sqlite3",
+    ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 86400))),
+    max_bytes=int(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024
+))
+
+def with_cache(model, node: str):
+    """
+    Returns `model` with the response cache enabled if `node` is listed in LLM_CACHE_NODES.
+    The copy shares the underlying API client.
+    """
+    if node not in LLM_CACHE_NODES:
+        return model
+    return model.model_copy(update={"cache": llm_cache})
@@ -0,0 +1,325 @@
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from langchain_core.exceptions import ModelAPIError, ModelConnectionError, ModelRateLimitError, ModelTimeoutError
+from app.core.config import get_settings
+from app.core.llm_cache import with_cache
+from app.core.metrics import LLM_CONCURRENCY_LIMIT, LLM_QUEUE_SECONDS, llm_metrics, record_retry
+
+# Per-model quota: requests and tokens per minute (0 = unlimited).
+# Override per model with LLM_LIMITS="model=rpm:tpm,model=rpm:tpm"
+LLM_RPM = int(os.getenv("LLM_RPM", "60"))
+LLM_TPM = int(os.getenv("LLM_TPM", "1000000"))
+# Adaptive concurrency: calls in flight per model float between 1 and LLM_MAX_CONCURRENCY
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", "0.5"))  # Multiplicative decrease on 429 / latency spike
+LLM_LATENCY_SPIKE = float(os.getenv("LLM_LATENCY_SPIKE", "3"))  # x the moving-average latency
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))  # Gateway retries on 429 / 5xx
+LLM_EXPECTED_OUTPUT_TOKENS = 500  # Reserved per call until the real usage is known
+
+# Lower number = served first
+PRIORITIES = {"interactive": 0, "background": 1}
+_priority = ContextVar("llm_priority", default="background")
+
+@contextmanager
+def llm_priority(lane: str):
+    """Runs every LLM call made inside the block (and tasks it spawns) in `lane`."""
+    if lane not in PRIORITIES:
+        raise ValueError(f"Unknown LLM priority lane: {lane}")
+    token = _priority.set(lane)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def _parse_limits(raw: str) -> dict:
+    limits = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        try:
+            model, rates = item.split("=", 1)
+            rpm, tpm = rates.split(":", 1)
+            limits[model.strip()] = (int(rpm), int(tpm))
+        except ValueError:
+            print(f"Ignoring malformed LLM_LIMITS entry: {item}")
+    return limits
+
+LLM_LIMITS = _parse_limits(os.getenv("LLM_LIMITS", ""))
+
+class TokenBucket:
+    """Refills `per_minute` units per minute up to a one-minute burst. 0 = unlimited."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (a request larger than the burst only waits for a full bucket)."""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float):
+        """Takes (or, with a negative amount, returns) units; the level may go negative (debt)."""
+        if self.capacity:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+class ModelLimiter:
+    """
+    Admission control for one model.
+    - Token buckets for requests and tokens per minute.
+    - AIMD concurrency: +1/limit per success, x LLM_BACKOFF on a 429 or a
+      latency spike (at most once per average call duration).
+    - Waiters are admitted in priority order, then FIFO.
+    Only touched from the event loop, so it needs no locks.
+    """
+
+    def __init__(self, model: str, rpm: int, tpm: int, max_concurrency: int):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.avg_latency = None
+        self._last_decrease = 0.0
+        self._waiters = []
+        self._order = itertools.count()
+        self._timer = None
+        LLM_CONCURRENCY_LIMIT.labels(model).set(self.limit)
+
+    async def acquire(self, tokens: int, lane: str):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters, (PRIORITIES[lane], next(self._order), tokens, future))
+        self._dispatch()
+        start = time.perf_counter()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(tokens, tokens, None, rate_limited=False)  # Admitted just before cancellation
+            raise
+        LLM_QUEUE_SECONDS.labels(self.model, lane).observe(time.perf_counter() - start)
+
+    def release(self, reserved: int, used: int, latency: float | None, rate_limited: bool):
+        """Frees the slot, settles the token reservation and adapts the concurrency limit."""
+        self.in_flight -= 1
+        self.tokens.take(used - reserved)
+        now = time.monotonic()
+        spike = (latency is not None and self.avg_latency is not None
+                 and latency > LLM_LATENCY_SPIKE * self.avg_latency)
+        if rate_limited or spike:
+            if now - self._last_decrease > (self.avg_latency or 1.0):
+                self.limit = max(1.0, self.limit * LLM_BACKOFF)
+                self._last_decrease = now
+                print(f"--- LLM Gateway: {self.model} {'rate limited' if rate_limited else 'latency spike'}, "
+                      f"concurrency -> {int(self.limit)} ---")
+        elif latency is not None:
+            self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+        if latency is not None and not rate_limited:
+            self.avg_latency = latency if self.avg_latency is None else 0.8 * self.avg_latency + 0.2 * latency
+        LLM_CONCURRENCY_LIMIT.labels(self.model).set(self.limit)
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():  # Cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= int(self.limit):
+                return  # release() dispatches again
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait > 0:
+                self._wake_in(wait)
+                return
+            heapq.heappop(self._waiters)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def _wake_in(self, delay: float):
+        loop = asyncio.get_running_loop()
+        if self._timer is not None and not self._timer.cancelled() and self._timer.when() <= loop.time() + delay:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = loop.call_later(delay, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+class LLMGateway:
+    """Process-wide admission control for every model, one ModelLimiter per model name."""
+
+    def __init__(self):
+        self.limiters = {}
+
+    def limiter(self, model: str) -> ModelLimiter:
+        if model not in self.limiters:
+            rpm, tpm = LLM_LIMITS.get(model, (LLM_RPM, LLM_TPM))
+            self.limiters[model] = ModelLimiter(model, rpm, tpm, LLM_MAX_CONCURRENCY)
+        return self.limiters[model]
+
+    async def call(self, model: str, messages: list, generate):
+        """
+        Runs `generate()` (a coroutine factory for one model call) once admitted.
+        Rate limits and transient server errors are retried here with backoff,
+        each attempt re-admitted through the limiter.
+        Args:
+            model (str): Model name, the key for quota and concurrency.
+            messages (list): Prompt messages, used to reserve tokens.
+            generate (callable): Returns the coroutine that performs the call.
+        Returns:
+            The ChatResult of the call.
+        """
+        limiter = self.limiter(model)
+        lane = _priority.get()
+        reserved = sum(len(str(message.content)) for message in messages) // 4 + LLM_EXPECTED_OUTPUT_TOKENS
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await limiter.acquire(reserved, lane)
+            start = time.monotonic()
+            try:
+                result = await generate()
+            except asyncio.CancelledError:
+                limiter.release(reserved, reserved, None, rate_limited=False)
+                raise
+            except Exception as e:
+                rate_limited = isinstance(e, ModelRateLimitError)
+                limiter.release(reserved, reserved, None, rate_limited=rate_limited)
+                retryable = rate_limited or isinstance(e, (ModelAPIError, ModelConnectionError, ModelTimeoutError))
+                if not retryable or attempt == LLM_MAX_RETRIES:
+                    raise
+                record_retry("llm", model)
+                delay = min(30.0, 2 ** attempt)
+                print(f"--- LLM Gateway: {model} call failed ({type(e).__name__}), retrying in {delay:.0f}s ---")
+                await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(result.generations[0].message, "usage_metadata", None) if result.generations else None
+            used = (usage or {}).get("total_tokens", reserved)
+            limiter.release(reserved, used, time.monotonic() - start, rate_limited=False)
+            return result
+
+    async def stream(self, model: str, messages: list, open_stream):
+        """
+        Streaming counterpart of call(): one admission per attempt, chunks passed
+        through as they arrive. Only failures before the first chunk are retried
+        (a half-streamed answer can't be taken back).
+        Args:
+            model (str): Model name, the key for quota and concurrency.
+            messages (list): Prompt messages, used to reserve tokens.
+            open_stream (callable): Returns the async iterator of ChatGenerationChunks.
+        Yields:
+            ChatGenerationChunk: As produced by the model.
+        """
+        limiter = self.limiter(model)
+        lane = _priority.get()
+        reserved = sum(len(str(message.content)) for message in messages) // 4 + LLM_EXPECTED_OUTPUT_TOKENS
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            await limiter.acquire(reserved, lane)
+            start = time.monotonic()
+            used, streamed, error = 0, False, None
+            outcome = (reserved, None, False)  # Used if the consumer stops early or we are cancelled
+            try:
+                async for chunk in open_stream():
+                    usage = getattr(chunk.message, "usage_metadata", None)
+                    used += (usage or {}).get("total_tokens", 0)  # Chunk usage is additive
+                    streamed = True
+                    yield chunk
+                outcome = (used or reserved, time.monotonic() - start, False)
+            except Exception as e:
+                error = e
+                outcome = (reserved, None, isinstance(e, ModelRateLimitError))
+            finally:
+                limiter.release(reserved, outcome[0], outcome[1], rate_limited=outcome[2])
+            if error is None:
+                return
+
+            retryable = outcome[2] or isinstance(error, (ModelAPIError, ModelConnectionError, ModelTimeoutError))
+            if streamed or not retryable or attempt == LLM_MAX_RETRIES:
+                raise error
+            record_retry("llm", model)
+            delay = min(30.0, 2 ** attempt)
+            print(f"--- LLM Gateway: {model} stream failed ({type(error).__name__}), retrying in {delay:.0f}s ---")
+            await asyncio.sleep(delay)
+
+gateway = LLMGateway()
+
+@lru_cache(maxsize=None)
+def get_llm(model: str, temperature: float):
+    """
+    Returns the shared gated model (GatewayChatModel) for (model, temperature).
+    Every module gets its models here, so all calls share one view of quota.
+    Retries are left to the gateway (the SDK makes a single attempt).
+    """
+    from app.core.gateway_model import GatewayChatModel  # Pulls in the Gemini SDK (~0.6s), so only on first use
+    return GatewayChatModel(
+        model=model,
+        google_api_key=get_settings().GOOGLE_API_KEY,
+        temperature=temperature,
+        max_retries=1,
+        callbacks=[llm_metrics]
+    )
+
+class LazyLLM:
+    """
+    Stand-in for a model declared at module level: the model is built by
+    get_llm() on first attribute access (e.g. the first ainvoke), not at import.
+    Importing an agent module therefore needs no credentials and no Gemini SDK.
+    """
+
+    def __init__(self, model: str, temperature: float, cache_node: str | None = None):
+        self._spec = (model, temperature, cache_node)
+        self._model = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        """The underlying model, built once."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    model, temperature, cache_node = self._spec
+                    llm = get_llm(model, temperature)
+                    self._model = with_cache(llm, cache_node) if cache_node else llm
+        return self._model
+
+    def __getattr__(self, name):
+        if name in ("_spec", "_model", "_lock"):  # Not initialized yet (copy/pickle)
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        model, temperature, cache_node = self._spec
+        state = "built" if self._model is not None else "not built"
+        return f"LazyLLM({model!r}, temperature={temperature}, cache_node={cache_node!r}, {state})"
+
+def lazy_llm(model: str, temperature: float, cache_node: str | None = None) -> LazyLLM:
+    """
+    Declares a module-level model without building it.
+    Args:
+        model (str): Gemini model name.
+        temperature (float): Sampling temperature.
+        cache_node (str): Node name for the response cache (see llm_cache.with_cache), if any.
+    Returns:
+        LazyLLM: Proxy that builds get_llm(model, temperature) on first use.
+    """
+    return LazyLLM(model, temperature, cache_node)
@@ -0,0 +1,159 @@
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Every step is labelled (kind, name):
+#   kind = node | worker | roundtable | tool | supabase | llm, name = node/role/step/tool/table/model
+STEP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+STEP_SECONDS = Histogram("agent_step_seconds", "Wall time per pipeline step", ["kind", "name"], buckets=STEP_BUCKETS)
+STEP_ERRORS = Counter("agent_step_errors_total", "Failed pipeline steps", ["kind", "name"])
+STEP_RETRIES = Counter("agent_step_retries_total", "Retried pipeline steps", ["kind", "name"])
+LLM_TOKENS = Histogram("agent_llm_tokens", "Tokens per LLM call", ["kind", "name", "model", "direction"], buckets=TOKEN_BUCKETS)
+LLM_COST = Counter("agent_llm_cost_usd_total", "Estimated LLM spend in USD", ["kind", "name", "model"])
+LLM_CACHE_HITS = Counter("agent_llm_cache_hits_total", "LLM calls answered by the response cache", ["kind", "name", "model"])
+LLM_CONCURRENCY_LIMIT = Gauge("agent_llm_concurrency_limit", "Adaptive concurrency limit per model", ["model"])
+LLM_QUEUE_SECONDS = Histogram("agent_llm_queue_seconds", "Wait for LLM gateway admission", ["model", "lane"], buckets=STEP_BUCKETS)
+
+# USD per million (input, output) tokens; override with LLM_PRICES="model=in:out,model=in:out"
+DEFAULT_LLM_PRICES = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-3-flash-preview": (0.50, 3.00),
+}
+
+def _parse_prices(raw: str) -> dict:
+    prices = dict(DEFAULT_LLM_PRICES)
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        try:
+            model, rates = item.split("=", 1)
+            input_rate, output_rate = rates.split(":", 1)
+            prices[model.strip()] = (float(input_rate), float(output_rate))
+        except ValueError:
+            print(f"Ignoring malformed LLM_PRICES entry: {item}")
+    return prices
+
+LLM_PRICES = _parse_prices(os.getenv("LLM_PRICES", ""))
+
+# The step currently running in this task/thread, used to attribute LLM tokens and errors
+_current_step = ContextVar("current_step", default=("other", "unknown"))
+
+@contextmanager
+def track(kind: str, name: str):
+    """Times a block as one step; an exception escaping it counts as an error."""
+    token = _current_step.set((kind, name))
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STEP_ERRORS.labels(kind, name).inc()
+        raise
+    finally:
+        STEP_SECONDS.labels(kind, name).observe(time.perf_counter() - start)
+        _current_step.reset(token)
+
+def timed(kind: str, name: str | None = None):
+    """Decorator form of track() for sync and async functions. `name` defaults to the function name."""
+    def decorator(func):
+        label = name or func.__name__
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with track(kind, label):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track(kind, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_error(kind: str | None = None, name: str | None = None):
+    """Counts an error that was handled (not raised). Defaults to the current step."""
+    if kind is None:
+        kind, name = _current_step.get()
+    STEP_ERRORS.labels(kind, name).inc()
+
+def record_retry(kind: str | None = None, name: str | None = None):
+    """Counts a retry. Defaults to the current step."""
+    if kind is None:
+        kind, name = _current_step.get()
+    STEP_RETRIES.labels(kind, name).inc()
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    Records token usage, estimated cost and errors of every LLM call,
+    attributed to the step that made it.
+    """
+    run_inline = True  # Read the caller's context, not an executor thread's
+
+    def __init__(self):
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or "unknown"
+        self._runs[run_id] = (*_current_step.get(), model.removeprefix("models/"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        kind, name, model = self._runs.pop(run_id, ("other", "unknown", "unknown"))
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                if usage.get("total_cost") == 0:
+                    # Replayed from the response cache, nothing was spent
+                    LLM_CACHE_HITS.labels(kind, name, model).inc()
+                    continue
+                input_tokens = usage.get("input_tokens", 0)
+                output_tokens = usage.get("output_tokens", 0)
+                LLM_TOKENS.labels(kind, name, model, "input").observe(input_tokens)
+                LLM_TOKENS.labels(kind, name, model, "output").observe(output_tokens)
+                input_rate, output_rate = LLM_PRICES.get(model, (0.0, 0.0))
+                LLM_COST.labels(kind, name, model).inc((input_tokens * input_rate + output_tokens * output_rate) / 1_000_000)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        kind, name, _ = self._runs.pop(run_id, ("other", "unknown", "unknown"))
+        STEP_ERRORS.labels(kind, name).inc()
+
+# Shared by every model; pass as callbacks=[llm_metrics]
+llm_metrics = LLMMetricsCallback()
+
+def supabase_event_hooks(is_async: bool = False) -> dict:
+    """
+    httpx event hooks that time every Supabase request, labelled by table
+    (or RPC / storage path). Errors are responses with status >= 400.
+    """
+    def on_request(request):
+        request.extensions["metrics_start"] = time.perf_counter()
+
+    def on_response(response):
+        start = response.request.extensions.get("metrics_start")
+        if start is None:
+            return
+        parts = response.request.url.path.strip("/").split("/")
+        # /rest/v1/<table>, /rest/v1/rpc/<fn>, /storage/v1/object/... -> keep it low-cardinality
+        name = "/".join(parts[2:4] if parts[2:3] == ["rpc"] else parts[2:3]) or parts[0]
+        STEP_SECONDS.labels("supabase", name).observe(time.perf_counter() - start)
+        if response.status_code >= 400:
+            STEP_ERRORS.labels("supabase", name).inc()
+
+    if not is_async:
+        return {"request": [on_request], "response": [on_response]}
+
+    async def on_request_async(request):
+        on_request(request)
+
+    async def on_response_async(response):
+        on_response(response)
+
+    return {"request": [on_request_async], "response": [on_response_async]}
+
+def render_metrics() -> tuple[bytes, str]:
+    """Returns (body, content type) for a Prometheus scrape."""
+    return generate_latest(), CONTENT_TYPE_LATEST
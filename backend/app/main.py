@@ -1,21 +1,230 @@
+import asyncio
+import json
 import os
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.models.schemas import ResearchRequest, ResearchResponse
-from app.agents.graph import app as agent_app
-from app.core.deduplication import check_is_duplicate, mark_as_seen
-from app.services.supabase_client import get_supabase
+from app.models.schemas import ResearchRequest, ResearchResponse, JobStatusResponse, CheckpointResponse
+from app.agents.graph import build_app
+from app.agents.artifacts import artifact_key
+from app.core.deduplication import check_is_duplicate, mark_as_seen, record_thread, warm_dedup_index, run_dedup_sync_loop
+from app.services.supabase_client import get_async_supabase
+from app.services.job_queue import JobStore, JobQueue
+from app.core.cache import cache_path
+from app.core.metrics import render_metrics
+from app.core.llm_gateway import llm_priority
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 import uuid
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, AsyncExitStack
+
+RESEARCH_WORKERS = int(os.getenv("RESEARCH_WORKERS", "2"))  # Concurrent /research jobs
+ENABLE_AUTONOMOUS_LOOP = os.getenv("ENABLE_AUTONOMOUS_LOOP", "true").lower() == "true"  # Off for API-only runs/benchmarks
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))  # Idle /research/stream comment interval
+
+# State fields reported with every finished node on /research/stream
+STREAM_COUNTERS = ("status", "revision_count", "debate_round", "quality_score")
+
+# Compiled in lifespan, with a SQLite checkpointer (CACHE_DIR/checkpoints.sqlite3)
+research_graph = None
+
+def _chunk_text(content) -> str:
+    """Text of a streamed message chunk (Gemini may send a list of parts)."""
+    if isinstance(content, list):
+        return "".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content or "")
+
+# Topics with a queued or running job: dedup key -> job id. Items are only marked seen once a
+# job saves, so without this two identical requests could both pass check_is_duplicate.
+_in_flight = {}
+
+def _job_keys(url: str, topic: str) -> set:
+    """The paper (Arxiv ID / URL) and the topic title; either one identifies a job's item."""
+    keys = {artifact_key("", topic)}
+    key = artifact_key(url)
+    if not key.startswith("topic:"):  # Manual topics have no real URL
+        keys.add(key)
+    return keys
+
+def _in_flight_job(url: str, topic: str) -> str | None:
+    return next((_in_flight[key] for key in _job_keys(url, topic) if key in _in_flight), None)
+
+def _reserve(url: str, topic: str, job_id: str):
+    for key in _job_keys(url, topic):
+        _in_flight.setdefault(key, job_id)
+
+def _release(url: str, topic: str, job_id: str):
+    for key in _job_keys(url, topic):
+        if _in_flight.get(key) == job_id:
+            del _in_flight[key]
+
+async def _submit_research(topic: str, url: str) -> tuple:
+    """
+    Queues a research job unless the item is covered or already queued/running.
+    Returns:
+        tuple: (job_id or None if a duplicate, True if job_id is an existing job)
+    """
+    existing = _in_flight_job(url, topic)
+    if existing:
+        return existing, True
+    if await check_is_duplicate(url, topic):
+        return None, False
+    existing = _in_flight_job(url, topic)  # Queued by a concurrent request during the check
+    if existing:
+        return existing, True
+    job_id = research_queue.submit({"topic": topic, "url": url})
+    _reserve(url, topic, job_id)
+    return job_id, False
+
+async def run_research_job(job_id: str, payload: dict, report_progress, emit) -> dict:
+    """Holds the job's in-flight reservation while it runs (re-taken for resumed jobs), then releases it."""
+    _reserve(payload["url"], payload["topic"], job_id)
+    try:
+        return await _run_research(job_id, payload, report_progress, emit)
+    finally:
+        # Succeeded: the item is marked seen now. Failed: a new request may retry it.
+        _release(payload["url"], payload["topic"], job_id)
+
+async def _run_research(job_id: str, payload: dict, report_progress, emit) -> dict:
+    """
+    Runs one research job: LangGraph (Search -> Read -> Write), then saves to Supabase.
+    Progress is reported after every graph node; node transitions and LLM tokens
+    are emitted live for /research/stream.
+    The job id is the graph thread id, so a job that failed or was interrupted
+    resumes from its last completed node instead of starting over.
+    """
+    topic = payload["topic"]
+    url = payload["url"]
+    config = {"configurable": {"thread_id": job_id}}
+
+    # Initial State
+    initial_state = {
+        "topic": topic,
+        "origin_url": url,
+        "messages": [],
+        "research_brief": "",
+        "urls_visited": [],
+        "status": "start"
+    }
+    graph_input = initial_state
+    
+    checkpoint = await research_graph.aget_state(config)
+    if checkpoint.values:
+        # None as input = continue from the saved state
+        print(f"--- Job {job_id}: Resuming before {list(checkpoint.next) or 'save'} ---", flush=True)
+        graph_input = None
+    
+    # Run Graph, recording each finished node as progress.
+    # /research is user-facing, so its LLM calls are admitted ahead of the autonomous loop's.
+    output = checkpoint.values or initial_state
+    if graph_input is not None or checkpoint.next:
+        with llm_priority("interactive"):
+            async for event in research_graph.astream_events(graph_input, config, version="v2"):
+                kind = event["event"]
+                node = event.get("metadata", {}).get("langgraph_node")
+                if kind == "on_chat_model_stream" and node:
+                    text = _chunk_text(event["data"]["chunk"].content)
+                    if text:
+                        emit({"type": "token", "node": node, "text": text})
+                elif kind == "on_chain_start" and node and event["name"] == node:
+                    emit({"type": "node_start", "node": node})
+                elif kind == "on_chain_end" and node and event["name"] == node:
+                    report_progress(node)
+                    update = event["data"].get("output")
+                    update = update if isinstance(update, dict) else {}
+                    emit({"type": "node_end", "node": node, **{key: update[key] for key in STREAM_COUNTERS if key in update}})
+                elif kind == "on_chain_end" and not event.get("parent_ids"):
+                    output = event["data"].get("output") or output  # The graph's final state
+    
+    # Extract Result (The Writer's message)
+    final_message = output['messages'][-1].content
+    critiques = output.get('critiques', []) # Get Skeptic/Hype comments
+    
+    # Save to Supabase. Each step is recorded in the job once it succeeds, so a retry
+    # or /resume after a failure here continues the save instead of repeating it.
+    report_progress("saving")
+    supabase = await get_async_supabase()
+    saved = job_store.get(job_id)["saved"]
+    
+    # Create Thread
+    if "thread_id" not in saved:
+        thread_data = {
+            "topic_title": topic,
+            "summary": final_message[:200] + "...", # Simple preview
+            "research_brief": output.get('research_brief', ''),
+        }
+        thread_res = await supabase.table("threads").insert(thread_data).execute()
+        saved["thread_id"] = thread_res.data[0]['id']
+        job_store.update(job_id, saved=saved)
+    thread_id = saved["thread_id"]
+    record_thread(topic)
+    
+    if not saved.get("comments"):
+        # Save the Post as the first "comment" (Aggregator)
+        comments_to_insert = [
+            {
+                "thread_id": thread_id,
+                "agent_persona": "Aggregator", 
+                "content": final_message
+            }
+        ]
+        
+        # Add Critiques (Skeptic / Hype)
+        for critique in critiques:
+            # Depending on graph implementation, critique might be dict or object
+            # in our graph.py, it's a dict: {"persona": "Skeptic", "content": "..."}
+            if isinstance(critique, dict):
+                 comments_to_insert.append({
+                    "thread_id": thread_id,
+                    "agent_persona": critique.get("persona", "Unknown"),
+                    "content": critique.get("content", "")
+                })
+        
+        await supabase.table("comments").insert(comments_to_insert).execute()
+        saved["comments"] = True
+        job_store.update(job_id, saved=saved)
+    
+    # Mark as Seen
+    if not saved.get("seen"):
+        await mark_as_seen(url, topic)
+        saved["seen"] = True
+        job_store.update(job_id, saved=saved)
+    report_progress("done")
+    
+    # Finished runs don't need their checkpoints
+    if research_graph.checkpointer is not None:
+        await research_graph.checkpointer.adelete_thread(job_id)
+    
+    return {"thread_id": thread_id, "content": final_message}
+
+job_store = JobStore()
+research_queue = JobQueue(job_store, run_research_job, RESEARCH_WORKERS)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup: Run Autonomous Loop
-    import asyncio
     from app.agents.trend_spotter import TrendSpotter
     from app.agents.manager import ManagerAgent
     
-    print("--- Starting Autonomous Research Loop ---", flush=True)
+    # Load the dedup index once; lookups are local from here on
+    try:
+        await warm_dedup_index()
+    except Exception as warm_error:
+        print(f"Dedup index warm-up failed: {warm_error}", flush=True)
+    sync_task = asyncio.create_task(run_dedup_sync_loop())
+    
+    # Durable graph checkpoints, so failed/interrupted research runs can resume
+    global research_graph
+    resources = AsyncExitStack()
+    checkpointer = await resources.enter_async_context(
+        AsyncSqliteSaver.from_conn_string(cache_path("checkpoints.sqlite3"))
+    )
+    research_graph = build_app(checkpointer)
+    
+    # Start /research workers (re-queues jobs interrupted by a restart)
+    await research_queue.start()
+    
+    if ENABLE_AUTONOMOUS_LOOP:
+        print("--- Starting Autonomous Research Loop ---", flush=True)
     
     async def run_loop():
         try:
@@ -28,7 +237,8 @@ async def lifespan(app: FastAPI):
             while True:
                 # 0. Check thread limit
                 try:
-                    thread_count_resp = get_supabase().table("threads").select("id", count="exact").execute()
+                    supabase = await get_async_supabase()
+                    thread_count_resp = await supabase.table("threads").select("id", count="exact").execute()
                     current_count = thread_count_resp.count or 0
                     
                     if current_count >= MAX_THREADS:
@@ -38,24 +248,25 @@ async def lifespan(app: FastAPI):
                 except Exception as count_error:
                     print(f"Thread count check failed: {count_error}", flush=True)
                 
-                # 1. Find a topic
+                # 1. Find a topic (served from the spotter's prefetched, deduplicated pool)
                 try:
-                    topic_data = spotter.find_trending_topic()
+                    topic_data = await spotter.find_trending_topic()
                     if topic_data:
-                        # 2. Check for Duplicates
+                        # 2. Re-check for Duplicates (local index): pooled topics may have been covered since
                         url = topic_data.get("origin_url", "")
                         title = topic_data.get("topic", "")
+                        summary = topic_data.get("summary", "")
                         
-                        is_dup = await check_is_duplicate(url, title)
+                        is_dup = await check_is_duplicate(url, title, summary)
                         if is_dup:
                             print(f"--- Skipping Duplicate: {title} ---", flush=True)
                             continue
                         
                         # 3. Mark as seen to prevent future duplicates
-                        await mark_as_seen(url, title)
+                        await mark_as_seen(url, title, summary)
                          
                         # 4. Trigger Manager
-                        manager.run_roundtable(topic_data)
+                        await manager.run_roundtable(topic_data)
                 except Exception as e:
                     print(f"Loop Error: {e}", flush=True)
                     
@@ -67,16 +278,20 @@ async def lifespan(app: FastAPI):
              print(f"CRITICAL: Loop Startup Failed: {startup_error}", flush=True)
 
     # Create Task
-    loop_task = asyncio.create_task(run_loop())
+    loop_task = asyncio.create_task(run_loop()) if ENABLE_AUTONOMOUS_LOOP else None
     
     yield
     
     # Shutdown: Cancel Loop
-    loop_task.cancel()
-    try:
-        await loop_task
-    except asyncio.CancelledError:
-        print("--- Autonomous Research Loop Stopped ---", flush=True)
+    await research_queue.stop()
+    sync_task.cancel()
+    if loop_task:
+        loop_task.cancel()
+        try:
+            await loop_task
+        except asyncio.CancelledError:
+            print("--- Autonomous Research Loop Stopped ---", flush=True)
+    await resources.aclose()
 
 app = FastAPI(title="Agentic Research API", lifespan=lifespan)
 
@@ -93,86 +308,135 @@ app.add_middleware(
 async def root():
     return {"status": "ok", "message": "Agent System Online"}
 
-@app.post("/research", response_model=ResearchResponse)
-async def trigger_research(request: ResearchRequest, background_tasks: BackgroundTasks):
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit rates and sizes of the fetch and LLM response caches and the research artifact store."""
+    from app.agents.tools import fetch_cache
+    from app.core.llm_cache import llm_cache
+    from app.agents.artifacts import artifact_store
+    return {"fetch": fetch_cache.stats(), "llm": llm_cache.stats(), "artifacts": artifact_store.stats()}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: step latency, tokens, cost, retries and errors."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.post("/research", response_model=ResearchResponse, status_code=202)
+async def trigger_research(request: ResearchRequest, response: Response):
     """
-    Triggers the Deep Research Agent.
+    Queues a Deep Research Agent job.
     1. Checks uniqueness.
-    2. Runs LangGraph (Search -> Read -> Write).
-    3. Saves to Supabase.
+    2. Enqueues the job (run by RESEARCH_WORKERS background workers).
+    3. Returns 202 with a job id; poll GET /research/{job_id} for the result.
     """
     topic = request.topic
     url = request.url or f"manual://{uuid.uuid4()}" # Generate dummy URL for manual topics
     
-    # 1. Deduplication Check
-    is_dupe = await check_is_duplicate(url, topic)
-    if is_dupe:
+    # 1. Deduplication Check (covered items, and items a queued/running job is already on), 2. Enqueue
+    job_id, existing = await _submit_research(topic, url)
+    if job_id is None:
+        response.status_code = 200
         return ResearchResponse(status="skipped", message="Topic already covered (Duplicate detected).")
+    if existing:
+        return ResearchResponse(status="queued", job_id=job_id, message=f"Already in progress; poll /research/{job_id}.")
+    return ResearchResponse(status="queued", job_id=job_id, message=f"Poll /research/{job_id} for progress.")
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
 
-    # 2. Run Agent (Synchronous for MVP, can be async/background)
+async def _job_events(job_id: str, events: asyncio.Queue):
+    """SSE body: a status snapshot, then live events until the job is done."""
     try:
-        # Initial State
-        initial_state = {
-            "topic": topic,
-            "messages": [],
-            "research_brief": "",
-            "urls_visited": [],
-            "status": "start"
-        }
-        
-        # Invoke Graph
-        output = agent_app.invoke(initial_state)
-        
-        # Extract Result (The Writer's message)
-        final_message = output['messages'][-1].content
-        critiques = output.get('critiques', []) # Get Skeptic/Hype comments
-        
-        # 3. Save to Supabase
-        supabase = get_supabase()
-        
-        # Create Thread
-        thread_data = {
-            "topic_title": topic,
-            "summary": final_message[:200] + "...", # Simple preview
-            "research_brief": output.get('research_brief', ''),
-        }
-        thread_res = supabase.table("threads").insert(thread_data).execute()
-        thread_id = thread_res.data[0]['id']
-        
-        # Save the Post as the first "comment" (Aggregator)
-        comments_to_insert = [
-            {
-                "thread_id": thread_id,
-                "agent_persona": "Aggregator", 
-                "content": final_message
-            }
-        ]
-        
-        # Add Critiques (Skeptic / Hype)
-        for critique in critiques:
-            # Depending on graph implementation, critique might be dict or object
-            # in our graph.py, it's a dict: {"persona": "Skeptic", "content": "..."}
-            if isinstance(critique, dict):
-                 comments_to_insert.append({
-                    "thread_id": thread_id,
-                    "agent_persona": critique.get("persona", "Unknown"),
-                    "content": critique.get("content", "")
-                })
-        
-        supabase.table("comments").insert(comments_to_insert).execute()
-        
-        # Mark as Seen
-        await mark_as_seen(url, topic)
-        
-        return ResearchResponse(
-            status="success", 
-            thread_id=thread_id, 
-            content=final_message
-        )
-        
-    except Exception as e:
-        print(f"Agent execution failed: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        job = job_store.get(job_id)
+        yield _sse({"type": "status", "job_id": job_id, "status": job["status"], "progress": job["progress"]})
+        if job["status"] in ("succeeded", "failed"):
+            yield _sse({"type": "done", "status": job["status"], "error": job["error"], **(job["result"] or {})})
+            return
+        while True:
+            try:
+                event = await asyncio.wait_for(events.get(), SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"  # Comment line: keeps proxies from closing an idle stream
+                continue
+            yield _sse(event)
+            if event["type"] == "done":
+                return
+    finally:
+        research_queue.unsubscribe(job_id, events)
+
+@app.get("/research/stream")
+async def research_stream(topic: str | None = None, url: str | None = None, job_id: str | None = None):
+    """
+    Server-Sent Events for a research job.
+    Starts one like POST /research (?topic=...&url=...), or follows an existing one (?job_id=...).
+    Events: status, node_start, token (LLM text as generated), node_end (with status,
+    revision_count, debate_round, quality_score), progress, and done with the result.
+    """
+    if job_id is None:
+        if not topic:
+            raise HTTPException(status_code=422, detail="Pass topic to start a job, or job_id to follow one")
+        url = url or f"manual://{uuid.uuid4()}"
+        job_id, _ = await _submit_research(topic, url)  # An identical job in progress is followed instead
+        if job_id is None:
+            async def skipped():
+                yield _sse({"type": "done", "status": "skipped", "message": "Topic already covered (Duplicate detected)."})
+            return StreamingResponse(skipped(), media_type="text/event-stream")
+    elif job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    # Subscribed before any await, so no event of a just-submitted job is missed
+    events = research_queue.subscribe(job_id)
+    return StreamingResponse(
+        _job_events(job_id, events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}  # No proxy buffering
+    )
+
+@app.get("/research/{job_id}", response_model=JobStatusResponse)
+async def research_status(job_id: str):
+    """Reports a research job's status, last finished step and result."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    result = job["result"] or {}
+    return JobStatusResponse(
+        job_id=job_id,
+        status=job["status"],
+        progress=job["progress"],
+        thread_id=result.get("thread_id"),
+        content=result.get("content"),
+        error=job["error"]
+    )
+
+@app.get("/research/{job_id}/checkpoint", response_model=CheckpointResponse)
+async def research_checkpoint(job_id: str):
+    """Inspects the saved graph state of a research run (cleared once it succeeds)."""
+    if job_store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    checkpoint = await research_graph.aget_state({"configurable": {"thread_id": job_id}})
+    values = checkpoint.values or {}
+    return CheckpointResponse(
+        job_id=job_id,
+        has_checkpoint=bool(values),
+        next_nodes=list(checkpoint.next),
+        status=values.get("status"),
+        revision_count=values.get("revision_count", 0),
+        debate_round=values.get("debate_round", 0),
+        has_research_brief=bool(values.get("research_brief"))
+    )
+
+@app.post("/research/{job_id}/resume", response_model=ResearchResponse, status_code=202)
+async def resume_research(job_id: str):
+    """Re-queues a failed research job; it continues from its last completed node."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "failed":
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}, only failed jobs can be resumed")
+    _reserve(job["payload"]["url"], job["payload"]["topic"], job_id)
+    research_queue.enqueue(job_id)
+    return ResearchResponse(status="queued", job_id=job_id, message=f"Poll /research/{job_id} for progress.")
 
 if __name__ == "__main__":
     import uvicorn
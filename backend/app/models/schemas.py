@@ -7,6 +7,25 @@ class ResearchRequest(BaseModel):
 
 class ResearchResponse(BaseModel):
     status: str
+    job_id: Optional[str] = None
     thread_id: Optional[str] = None
     content: Optional[str] = None
     message: Optional[str] = None
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str # queued | running | succeeded | failed
+    progress: Optional[str] = None # Last finished graph node
+    thread_id: Optional[str] = None
+    content: Optional[str] = None
+    error: Optional[str] = None
+
+
+class CheckpointResponse(BaseModel):
+    job_id: str
+    has_checkpoint: bool
+    next_nodes: List[str] = [] # Nodes that run next on resume
+    status: Optional[str] = None # Graph status at the last checkpoint
+    revision_count: int = 0
+    debate_round: int = 0
+    has_research_brief: bool = False
\ No newline at end of file
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from app.core.metrics import record_retry
+
+# Flush thresholds for buffered comments
+COMMENT_BATCH_SIZE = int(os.getenv("COMMENT_BATCH_SIZE", "20"))
+COMMENT_FLUSH_SECONDS = float(os.getenv("COMMENT_FLUSH_SECONDS", "30"))
+COMMENT_MAX_RETRIES = int(os.getenv("COMMENT_MAX_RETRIES", "3"))
+
+class CommentBuffer:
+    """
+    Write-behind buffer for `comments` rows.
+    add() returns immediately; a background thread bulk-inserts rows once
+    `max_batch` are pending, the oldest has waited `max_delay` seconds,
+    or close() is called.
+    Ordering is preserved: batches are written one at a time, a failed batch
+    is retried before the next one, and each row gets a strictly increasing
+    `created_at` (the frontend sorts comments by it).
+    """
+
+    def __init__(self, supabase, max_batch: int = COMMENT_BATCH_SIZE, max_delay: float = COMMENT_FLUSH_SECONDS,
+                 max_retries: int = COMMENT_MAX_RETRIES):
+        self.supabase = supabase
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.inserts = 0
+        self._pending = []
+        self._oldest = 0.0  # monotonic time the oldest pending row was added
+        self._last_timestamp = datetime.min.replace(tzinfo=timezone.utc)
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="comment-buffer", daemon=True)
+        self._thread.start()
+
+    def _next_timestamp(self) -> str:
+        now = datetime.now(timezone.utc)
+        if now <= self._last_timestamp:
+            now = self._last_timestamp + timedelta(microseconds=1)
+        self._last_timestamp = now
+        return now.isoformat()
+
+    def add(self, row: dict):
+        """Queues one row without blocking on the database."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("CommentBuffer is closed")
+            row = dict(row)
+            row.setdefault("created_at", self._next_timestamp())
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(row)
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+
+    def close(self, timeout: float | None = None):
+        """Flushes everything still pending and stops the writer thread."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and len(self._pending) < self.max_batch:
+                    if self._pending:
+                        remaining = self.max_delay - (time.monotonic() - self._oldest)
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                    else:
+                        self._cond.wait()
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self._oldest = time.monotonic()
+                finished = self._closed and not self._pending
+
+            if batch:
+                self._insert(batch)
+            if finished:
+                return
+
+    def _insert(self, batch: list):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.supabase.table("comments").insert(batch).execute()
+                self.inserts += 1
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Error saving {len(batch)} comment(s) after {attempt + 1} attempts: {e}")
+                    return
+                print(f"Error saving comments (attempt {attempt + 1}), retrying: {e}")
+                record_retry("supabase", "comments")
+                time.sleep(0.5 * 2 ** attempt)
@@ -0,0 +1,185 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from app.core.cache import cache_path
+
+JOB_EVENT_BUFFER = 1000  # Events queued per stream subscriber; the oldest are dropped past this
+
+class JobStore:
+    """
+    Durable record of background jobs, backed by SQLite.
+    Survives restarts: jobs that were queued or running when the process
+    died are picked up again by JobQueue.start().
+    """
+
+    def __init__(self, filename: str = "jobs.sqlite3"):
+        self.filename = filename
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(cache_path(self.filename), check_same_thread=False, timeout=30)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    saved TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            # jobs.sqlite3 files from before `saved` existed
+            if "saved" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN saved TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs(status, created_at)")
+            self._conn.commit()
+        return self._conn
+
+    def create(self, payload: dict) -> str:
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT INTO jobs (id, payload, status, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?)",
+                (job_id, json.dumps(payload), now, now)
+            )
+            conn.commit()
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["saved"] = json.loads(job["saved"]) if job["saved"] else {}
+        return job
+
+    def update(self, job_id: str, **fields):
+        """
+        Updates status/progress/result/error/saved.
+        `result` and `saved` (side effects a handler already completed, so a retry skips them) are stored as JSON.
+        """
+        for name in ("result", "saved"):
+            if name in fields:
+                fields[name] = json.dumps(fields[name])
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            conn.commit()
+
+    def requeue_interrupted(self) -> list:
+        """Marks jobs left queued/running by a previous process as queued and returns their ids, oldest first."""
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+            conn.execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'")
+            conn.commit()
+        return [row["id"] for row in rows]
+
+class JobQueue:
+    """
+    Bounded worker pool over a JobStore.
+    submit() returns immediately; `workers` asyncio tasks run jobs through
+    `handler(job_id, payload, report_progress, emit)` and record the result.
+    Live events (progress, anything the handler emits, the final status) are
+    fanned out to subscribe()rs; they are not stored.
+    """
+
+    def __init__(self, store: JobStore, handler, workers: int):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self._queue = None
+        self._tasks = []
+        self._subscribers = {}  # job_id -> set of asyncio.Queue
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        resumed = self.store.requeue_interrupted()
+        for job_id in resumed:
+            self._queue.put_nowait(job_id)
+        if resumed:
+            print(f"--- Job Queue: Resuming {len(resumed)} interrupted job(s) ---", flush=True)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, payload: dict) -> str:
+        job_id = self.store.create(payload)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Returns a queue receiving the job's events from now on (call unsubscribe() when done)."""
+        events = asyncio.Queue(maxsize=JOB_EVENT_BUFFER)
+        self._subscribers.setdefault(job_id, set()).add(events)
+        return events
+
+    def unsubscribe(self, job_id: str, events: asyncio.Queue):
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(events)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    def publish(self, job_id: str, event: dict):
+        """Delivers an event to every subscriber; a slow one loses its oldest events, never the newest."""
+        for events in self._subscribers.get(job_id, ()):
+            if events.full():
+                events.get_nowait()
+            events.put_nowait(event)
+
+    def enqueue(self, job_id: str):
+        """Puts an existing job back on the queue (e.g. to retry a failed one)."""
+        self.store.update(job_id, status="queued", error=None)
+        self._queue.put_nowait(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                job = self.store.get(job_id)
+                if job is None or job["status"] != "queued":
+                    continue
+                self.store.update(job_id, status="running")
+                self.publish(job_id, {"type": "status", "status": "running"})
+
+                def report_progress(progress: str, job_id=job_id):
+                    self.store.update(job_id, progress=progress)
+                    self.publish(job_id, {"type": "progress", "progress": progress})
+
+                def emit(event: dict, job_id=job_id):
+                    self.publish(job_id, event)
+
+                try:
+                    result = await self.handler(job_id, job["payload"], report_progress, emit)
+                    self.store.update(job_id, status="succeeded", result=result)
+                    self.publish(job_id, {"type": "done", "status": "succeeded", **result})
+                except Exception as e:
+                    print(f"Job {job_id} failed: {e}", flush=True)
+                    self.store.update(job_id, status="failed", error=str(e))
+                    self.publish(job_id, {"type": "done", "status": "failed", "error": str(e)})
+            finally:
+                self._queue.task_done()
@@ -1,14 +1,81 @@
-from supabase import create_client, Client
+import asyncio
+import os
+import threading
+from typing import TYPE_CHECKING
+import httpx
 from app.core.config import get_settings
+from app.core.metrics import supabase_event_hooks
 
-settings = get_settings()
-
-def get_supabase() -> Client:
-    try:
-        url = settings.SUPABASE_URL
-        key = settings.SUPABASE_SECRET_KEY
-        return create_client(url, key)
-    except Exception as e:
-        print(f"Error initializing Supabase client: {e}")
-        # Return dummy or raise based on strictness
-        raise e
+if TYPE_CHECKING:
+    from supabase import Client, AsyncClient
+
+# The supabase package and settings are only loaded when the first client is created
+
+# Shared HTTP pool: connections (and TLS sessions) are reused across all queries
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_KEEPALIVE_SECONDS = float(os.getenv("SUPABASE_KEEPALIVE_SECONDS", "60"))
+SUPABASE_TIMEOUT = 120  # Same as supabase-py's default postgrest timeout
+
+_client: "Client | None" = None
+_client_lock = threading.Lock()
+_async_client: "AsyncClient | None" = None
+_async_client_lock = asyncio.Lock()
+
+def _pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=SUPABASE_MAX_CONNECTIONS,
+        max_keepalive_connections=SUPABASE_MAX_CONNECTIONS,
+        keepalive_expiry=SUPABASE_KEEPALIVE_SECONDS
+    )
+
+def get_supabase() -> "Client":
+    """
+    Returns the process-wide Supabase client, created on first call.
+    Every caller shares one keep-alive HTTP connection pool; requests are timed for /metrics.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            try:
+                from supabase import create_client, ClientOptions
+                settings = get_settings()
+                http_client = httpx.Client(
+                    limits=_pool_limits(), timeout=SUPABASE_TIMEOUT, event_hooks=supabase_event_hooks()
+                )
+                _client = create_client(
+                    settings.SUPABASE_URL,
+                    settings.SUPABASE_SECRET_KEY,
+                    options=ClientOptions(httpx_client=http_client)
+                )
+            except Exception as e:
+                print(f"Error initializing Supabase client: {e}")
+                raise e
+    return _client
+
+async def get_async_supabase() -> "AsyncClient":
+    """
+    Async variant of get_supabase() for FastAPI paths, so queries
+    don't block the event loop. Also a process-wide singleton.
+    """
+    global _async_client
+    if _async_client is not None:
+        return _async_client
+    async with _async_client_lock:
+        if _async_client is None:
+            try:
+                from supabase import acreate_client, AsyncClientOptions
+                settings = get_settings()
+                http_client = httpx.AsyncClient(
+                    limits=_pool_limits(), timeout=SUPABASE_TIMEOUT, event_hooks=supabase_event_hooks(is_async=True)
+                )
+                _async_client = await acreate_client(
+                    settings.SUPABASE_URL,
+                    settings.SUPABASE_SECRET_KEY,
+                    options=AsyncClientOptions(httpx_client=http_client)
+                )
+            except Exception as e:
+                print(f"Error initializing async Supabase client: {e}")
+                raise e
+    return _async_client
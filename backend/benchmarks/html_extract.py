@@ -0,0 +1,114 @@
+"""
+Micro-benchmark: HTML-to-text extraction engines.
+
+Compares the previous scrape_web_content path (BeautifulSoup html.parser,
+decompose boilerplate, full get_text, then clip) with html_extractor's
+streaming stdlib engine and, if installed, selectolax.
+
+Usage (from backend/):
+    python -m benchmarks.html_extract                       # synthetic pages
+    python -m benchmarks.html_extract --corpus saved_pages/ # your own *.html files
+    python -m benchmarks.html_extract --save-corpus saved_pages/  # write the synthetic set
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+from difflib import SequenceMatcher
+from bs4 import BeautifulSoup
+from app.agents.html_extractor import LexborHTMLParser, HTML_TEXT_MAX_CHARS, SKIP_TAGS, extract_text
+
+def extract_bs4(data: bytes, max_chars: int) -> str:
+    """The extraction scrape_web_content used before html_extractor."""
+    soup = BeautifulSoup(data, "html.parser")
+    for tag in soup(list(SKIP_TAGS)):
+        tag.decompose()
+    return soup.get_text(separator=" ", strip=True)[:max_chars]
+
+ENGINES = {
+    "bs4 (previous)": extract_bs4,
+    "stdlib streaming": lambda data, max_chars: extract_text(data, max_chars=max_chars, engine="stdlib"),
+}
+if LexborHTMLParser is not None:
+    ENGINES["selectolax"] = lambda data, max_chars: extract_text(data, max_chars=max_chars, engine="selectolax")
+    ENGINES["auto"] = lambda data, max_chars: extract_text(data, max_chars=max_chars, engine="auto")
+
+def synthetic_page(paragraphs: int, seed: int) -> bytes:
+    """A page with the usual boilerplate: inline scripts, styles, menus and a footer around the article."""
+    words = "model training data attention layer benchmark result latency memory token context reasoning".split()
+    script = "<script>" + "var x = {a: 1, b: [1, 2, 3]}; function f(y) { return y * 2; } " * 200 + "</script>"
+    nav = "<nav><ul>" + "".join(f"<li><a href='/s/{i}'>Section {i}</a></li>" for i in range(100)) + "</ul></nav>"
+    body = "".join(
+        f"<div class='post'><p>{' '.join(words[(i + j + seed) % len(words)] for j in range(40))} &amp; more.</p></div>"
+        for i in range(paragraphs)
+    )
+    return (f"<!DOCTYPE html><html><head><title>Page {seed}</title><style>{'.c{color:red}' * 500}</style>"
+            f"{script}</head><body>{nav}<main>{body}</main>{script}<footer>{'Links ' * 500}</footer>"
+            f"</body></html>").encode("utf-8")
+
+def synthetic_corpus() -> dict:
+    # ~20 KB, ~200 KB and ~2 MB (HTML_MAX_BYTES) pages
+    sizes = {"small": 40, "medium": 700, "large": 7000}
+    return {f"{name}-{seed}.html": synthetic_page(paragraphs, seed) for name, paragraphs in sizes.items() for seed in range(3)}
+
+def load_corpus(directory: str) -> dict:
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(directory, "*.htm*"))):
+        with open(path, "rb") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+def time_engine(engine, pages: dict, max_chars: int, repeat: int) -> tuple[dict, dict]:
+    """Returns ({page: median seconds}, {page: output})."""
+    timings, outputs = {}, {}
+    for name, data in pages.items():
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs[name] = engine(data, max_chars)
+            samples.append(time.perf_counter() - start)
+        timings[name] = statistics.median(samples)
+    return timings, outputs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare HTML-to-text extraction engines.")
+    parser.add_argument("--corpus", help="Directory of saved *.html pages (default: synthetic pages)")
+    parser.add_argument("--save-corpus", help="Write the synthetic pages to this directory and exit")
+    parser.add_argument("--max-chars", type=int, default=HTML_TEXT_MAX_CHARS)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page (median is reported)")
+    args = parser.parse_args(argv)
+
+    if args.save_corpus:
+        os.makedirs(args.save_corpus, exist_ok=True)
+        for name, data in synthetic_corpus().items():
+            with open(os.path.join(args.save_corpus, name), "wb") as f:
+                f.write(data)
+        print(f"Wrote synthetic corpus to {args.save_corpus}")
+        return
+
+    pages = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    if not pages:
+        raise SystemExit(f"No *.html files in {args.corpus}")
+    total_mb = sum(len(data) for data in pages.values()) / (1024 * 1024)
+    print(f"{len(pages)} pages, {total_mb:.1f} MB, budget {args.max_chars} chars")
+
+    baseline_name = next(iter(ENGINES))
+    results = {name: time_engine(engine, pages, args.max_chars, args.repeat) for name, engine in ENGINES.items()}
+    baseline_total = sum(results[baseline_name][0].values())
+
+    print(f"\n{'engine':<18} {'total ms':>10} {'MB/s':>8} {'speedup':>8} {'p50 page ms':>12} {'max page ms':>12} {'same text':>10} {'similarity':>11}")
+    for name, (timings, outputs) in results.items():
+        total = sum(timings.values())
+        reference = results[baseline_name][1]
+        same = sum(outputs[page] == reference[page] for page in pages)
+        similarity = statistics.mean(
+            SequenceMatcher(None, outputs[page][:5000], reference[page][:5000], autojunk=False).quick_ratio()
+            for page in pages
+        )
+        print(f"{name:<18} {total * 1000:>10.1f} {total_mb / total:>8.1f} {baseline_total / total:>7.1f}x "
+              f"{statistics.median(timings.values()) * 1000:>12.2f} {max(timings.values()) * 1000:>12.2f} "
+              f"{same:>5}/{len(pages):<4} {similarity:>11.3f}")
+
+if __name__ == "__main__":
+    main()
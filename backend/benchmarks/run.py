@@ -0,0 +1,335 @@
+"""
+Offline end-to-end benchmarks.
+
+Runs the real pipeline code against local stand-ins (benchmarks/stubs.py):
+a fake chat model, a canned HTML/PDF server on 127.0.0.1 and an in-memory
+Supabase. No API keys, quota or network needed.
+
+Scenarios:
+    graph        graph.app.ainvoke per topic (research -> write -> debate)
+    roundtable   ManagerAgent.run_roundtable per topic
+    trendspotter TrendSpotter.find_trending_topic
+    api          POST /research + polling GET /research/{job_id}
+    stream       GET /research/stream (SSE) against a local uvicorn; also reports time to first token
+
+Usage (from backend/):
+    python -m benchmarks.run --scenario all --topics 20 --concurrency 4
+    python -m benchmarks.run --scenario graph --llm-latency 0.5 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+SCENARIOS = ["graph", "roundtable", "trendspotter", "api", "stream"]
+
+# Titles are drawn from this vocabulary so topics don't trip near-duplicate detection
+TITLE_WORDS = """sparse mixture experts routing attention linear recurrent state space diffusion
+transformer retrieval augmented reasoning chain verifier reward model preference distillation
+quantization pruning speculative decoding kernel memory efficient multimodal vision language
+agent planning tool calling benchmark robustness alignment calibration curriculum synthetic""".split()
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def summarize(name: str, latencies: list, errors: int, elapsed: float) -> dict:
+    return {
+        "scenario": name,
+        "topics": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "topics_per_min": round(len(latencies) / elapsed * 60, 2) if elapsed else 0.0,
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p99_s": round(percentile(latencies, 99), 3),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def configure_environment(args):
+    """
+    Must run before any app module is imported: caches and limits read env at import time.
+    No credentials are needed; LLM and Supabase clients are stubbed before first use.
+    """
+    os.environ["CACHE_DIR"] = args.cache_dir or tempfile.mkdtemp(prefix="agentic-bench-")
+    os.environ["LLM_CACHE_NODES"] = ""  # Every call pays the simulated latency
+    os.environ["DEDUP_EMBEDDER"] = "hashing"  # Semantic dedup on, offline (match_documents runs in memory)
+    os.environ["ENABLE_AUTONOMOUS_LOOP"] = "false"
+    os.environ["RESEARCH_WORKERS"] = str(args.concurrency)
+    os.environ["COMMENT_FLUSH_SECONDS"] = "0.5"
+    os.environ["LLM_RPM"] = str(args.llm_rpm)
+    os.environ["LLM_TPM"] = str(args.llm_tpm)
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.llm_concurrency)
+
+class Bench:
+    """Imports the app with every external dependency replaced by a local stand-in."""
+
+    def __init__(self, args):
+        from benchmarks.stubs import FakeChatModel, CannedWebServer, InMemorySupabase, AsyncInMemorySupabase
+        from app.services import supabase_client
+
+        self.args = args
+        self.db = InMemorySupabase(latency=args.db_latency)
+        # Seed the client singletons before anything calls get_supabase()
+        supabase_client._client = self.db
+        supabase_client._async_client = AsyncInMemorySupabase(self.db)
+        self.web = CannedWebServer(latency=args.web_latency, pdf_pages=args.pdf_pages).start()
+        self._ids = iter(range(1, 10 ** 9))
+
+        from app.core.metrics import llm_metrics, timed
+        from app.agents import tools, graph, workers, manager, trend_spotter, resolver
+
+        def fake_llm(model: str):
+            return FakeChatModel(model=model, latency=args.llm_latency, output_tokens=args.tokens, callbacks=[llm_metrics])
+
+        graph.research_llm = graph.self_reflect_llm = graph.critic_llm = fake_llm("gemini-2.0-flash")
+        graph.writer_llm = fake_llm("gemini-2.0-flash")
+        workers.worker_llm = fake_llm("gemini-3-flash-preview")
+        manager.personas_llm = fake_llm("gemini-3-flash-preview")
+        manager.summary_llm = fake_llm("gemini-2.0-flash")
+
+        # The canned server is on loopback, which the SSRF guard (rightly) refuses
+        resolver.is_public_ip = lambda ip: True
+
+        # Search tools return canned pages; fresh URLs per call keep the fetch cache cold
+        @timed("tool", "search_web")
+        def search_web(query: str, max_results: int = 5):
+            time.sleep(args.tool_latency)
+            return [
+                {"title": f"Result {n} for {query}", "href": self.web.page_url(n), "body": f"Snippet {n} about {query}"}
+                for n in (next(self._ids) for _ in range(max_results))
+            ]
+
+        @timed("tool", "search_arxiv")
+        def search_arxiv(query: str, max_results: int = 3):
+            time.sleep(args.tool_latency)
+            return [self._paper(next(self._ids)) for _ in range(max_results)]
+
+        @timed("tool", "fetch_hf_daily_papers")
+        def fetch_hf_daily_papers(max_results: int = 10):
+            time.sleep(args.tool_latency)
+            return [self._paper(next(self._ids)) for _ in range(max_results)]
+
+        for module in (tools, graph, workers, trend_spotter):
+            for name, stub in (("search_web", search_web), ("search_arxiv", search_arxiv),
+                               ("fetch_hf_daily_papers", fetch_hf_daily_papers)):
+                if hasattr(module, name):
+                    setattr(module, name, stub)
+
+        self.graph = graph
+        self.manager = manager
+        self.trend_spotter = trend_spotter
+
+    def _paper(self, n: int) -> dict:
+        arxiv_id = f"2401.{n:05d}"
+        rng = random.Random(n)
+        title = " ".join(rng.sample(TITLE_WORDS, 6)).title()
+        return {
+            "title": f"{title} ({n})",
+            "id": f"http://arxiv.org/abs/{arxiv_id}v1",
+            "arxiv_id": arxiv_id,
+            "summary": f"Abstract of {title}. " + " ".join(rng.choices(TITLE_WORDS, k=80)),
+            "upvotes": n % 50,
+            "published": "2024-01-01",
+            "pdf_url": self.web.pdf_url(arxiv_id),
+            "hf_url": f"https://huggingface.co/papers/{arxiv_id}",
+        }
+
+    def topic(self) -> dict:
+        paper = self._paper(next(self._ids))
+        return {"topic": f"Paper: {paper['title']}", "source": "Benchmark", "origin_url": paper["pdf_url"], "summary": paper["summary"]}
+
+    async def _run_concurrently(self, name: str, job) -> dict:
+        """Runs `job()` --topics times, at most --concurrency at once."""
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        latencies, errors = [], 0
+
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    await job()
+                except Exception as e:
+                    errors += 1
+                    print(f"{name} run failed: {e}", file=sys.stderr)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(self.args.topics)))
+        return summarize(name, latencies, errors, time.perf_counter() - start)
+
+    async def bench_graph(self) -> dict:
+        async def job():
+            topic = self.topic()
+            output = await self.graph.app.ainvoke({
+                "topic": topic["topic"], "origin_url": topic["origin_url"], "messages": [], "research_brief": "",
+                "urls_visited": [], "status": "start"
+            })
+            if output.get("status") != "completed":
+                raise RuntimeError(f"graph ended with status {output.get('status')}")
+        return await self._run_concurrently("graph", job)
+
+    async def bench_roundtable(self) -> dict:
+        async def job():
+            await self.manager.ManagerAgent().run_roundtable(self.topic())
+        return await self._run_concurrently("roundtable", job)
+
+    async def bench_trendspotter(self) -> dict:
+        spotter = self.trend_spotter.TrendSpotter()
+
+        async def job():
+            if not await spotter.find_trending_topic():
+                raise RuntimeError("no topic found")
+        return await self._run_concurrently("trendspotter", job)
+
+    def bench_api(self) -> dict:
+        """Submits every topic at once, then polls until each job finishes (RESEARCH_WORKERS = --concurrency)."""
+        from fastapi.testclient import TestClient
+        from app import main
+
+        latencies, errors = [], 0
+        with TestClient(main.app) as client:
+            start = time.perf_counter()
+            pending = {}
+            for _ in range(self.args.topics):
+                topic = self.topic()
+                response = client.post("/research", json={"topic": topic["topic"], "url": topic["origin_url"]})
+                response.raise_for_status()
+                job_id = response.json().get("job_id")
+                if job_id is None:
+                    errors += 1  # Skipped as a duplicate
+                    continue
+                pending[job_id] = time.perf_counter()
+
+            while pending:
+                time.sleep(0.05)
+                for job_id, submitted in list(pending.items()):
+                    status = client.get(f"/research/{job_id}").json()["status"]
+                    if status in ("succeeded", "failed"):
+                        latencies.append(time.perf_counter() - submitted)
+                        errors += status == "failed"
+                        del pending[job_id]
+            elapsed = time.perf_counter() - start
+        return summarize("api", latencies, errors, elapsed)
+
+    def bench_stream(self) -> dict:
+        """Streams --topics jobs (--concurrency at once) over real HTTP, timing the first token and the done event."""
+        import httpx
+        import socket
+        import threading
+        import uvicorn
+        from app import main
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.05)
+
+        first_tokens = []
+
+        async def run():
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+                async def job():
+                    topic = self.topic()
+                    start = time.perf_counter()
+                    event, first_token = None, None
+                    params = {"topic": topic["topic"], "url": topic["origin_url"]}
+                    async with client.stream("GET", "/research/stream", params=params) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if line.startswith("event: "):
+                                event = line[len("event: "):]
+                                if event == "token" and first_token is None:
+                                    first_token = time.perf_counter() - start
+                            elif line.startswith("data: ") and event == "done":
+                                done = json.loads(line[len("data: "):])
+                                if done["status"] != "succeeded":
+                                    raise RuntimeError(f"job ended {done['status']}: {done.get('error') or done.get('message')}")
+                    if first_token is not None:
+                        first_tokens.append(first_token)
+                return await self._run_concurrently("stream", job)
+
+        try:
+            result = asyncio.run(run())
+        finally:
+            server.should_exit = True
+            thread.join()
+        result["first_token_p50_s"] = round(percentile(first_tokens, 50), 3)
+        return result
+
+    def close(self):
+        self.web.stop()
+
+def print_table(results: list):
+    columns = ["scenario", "topics", "errors", "elapsed_s", "topics_per_min", "p50_s", "p99_s", "peak_rss_mb",
+               "prompt_tokens_per_call", "first_token_p50_s"]
+    widths = [max(len(column), *(len(str(row.get(column, ""))) for row in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for row in results:
+        print("  ".join(str(row.get(column, "")).ljust(width) for column, width in zip(columns, widths)))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmarks with fake LLM, web and Supabase.")
+    parser.add_argument("--scenario", choices=SCENARIOS + ["all"], default="all")
+    parser.add_argument("--topics", type=int, default=10, help="Topics (runs) per scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="Topics in flight at once")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    parser.add_argument("--tokens", type=int, default=150, help="Output tokens per fake LLM call")
+    parser.add_argument("--llm-rpm", type=int, default=0, help="Gateway requests/min per model (0 = unlimited)")
+    parser.add_argument("--llm-tpm", type=int, default=0, help="Gateway tokens/min per model (0 = unlimited)")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Gateway max calls in flight per model")
+    parser.add_argument("--web-latency", type=float, default=0.05, help="Seconds per canned HTTP response")
+    parser.add_argument("--tool-latency", type=float, default=0.1, help="Seconds per search/arXiv/HF call")
+    parser.add_argument("--db-latency", type=float, default=0.01, help="Seconds per Supabase query")
+    parser.add_argument("--pdf-pages", type=int, default=12, help="Pages in the canned PDF")
+    parser.add_argument("--cache-dir", help="CACHE_DIR to use (default: a fresh temp dir, i.e. cold caches)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_environment(args)
+    bench = Bench(args)
+    scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+    results = []
+    from benchmarks.stubs import USAGE
+    try:
+        for scenario in scenarios:
+            print(f"--- Benchmark: {scenario} ({args.topics} topics, concurrency {args.concurrency}) ---", flush=True)
+            calls, input_tokens = USAGE["calls"], USAGE["input_tokens"]
+            if scenario in ("api", "stream"):
+                result = getattr(bench, f"bench_{scenario}")()
+            else:
+                result = asyncio.run(getattr(bench, f"bench_{scenario}")())
+            calls = USAGE["calls"] - calls
+            result["prompt_tokens_per_call"] = round((USAGE["input_tokens"] - input_tokens) / calls) if calls else 0
+            results.append(result)
+    finally:
+        bench.close()
+
+    print()
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
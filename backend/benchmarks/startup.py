@@ -0,0 +1,107 @@
+"""
+Startup benchmark: cold import time of the app modules, checked against a budget.
+
+Each module is imported in a fresh interpreter with no credentials in the
+environment (as in CI or a freshly forked worker). A run fails if an import
+takes longer than the budget, or if it builds anything that should only be
+built on first use: settings, LLM clients (or the Gemini SDK), the Supabase
+client, or the compiled graph.
+
+Usage (from backend/):
+    python -m benchmarks.startup                    # default budget
+    python -m benchmarks.startup --budget-ms 1000 --repeat 5
+    python -m benchmarks.startup --modules app.main --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+STARTUP_BUDGET_MS = 2000  # Median cold import of app.main (FastAPI + LangGraph) is ~1.3s
+MODULES = ["app.main", "app.agents.graph", "app.agents.manager", "app.agents.workers", "app.core.deduplication"]
+CREDENTIALS = ("SUPABASE_URL", "SUPABASE_SECRET_KEY", "SUPABASE_KEY", "GOOGLE_API_KEY", "GROQ_API_KEY", "OPENAI_API_KEY")
+
+# Runs in the child: times the import, then reports what it initialized
+PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+from app.core.config import get_settings
+from app.core.llm_gateway import get_llm
+from app.services import supabase_client
+graph = sys.modules.get("app.agents.graph")
+eager = {
+    "settings": get_settings.cache_info().currsize > 0,
+    "llm clients": get_llm.cache_info().currsize > 0,
+    "gemini sdk": "langchain_google_genai" in sys.modules,
+    "supabase client": supabase_client._client is not None or "supabase" in sys.modules,
+    "compiled graph": graph is not None and "app" in vars(graph),
+}
+print(json.dumps({"seconds": seconds, "eager": [name for name, built in eager.items() if built]}))
+"""
+
+def clean_env() -> dict:
+    env = {key: value for key, value in os.environ.items() if key not in CREDENTIALS}
+    env["CACHE_DIR"] = tempfile.mkdtemp(prefix="agentic-startup-")
+    return env
+
+def import_once(module: str, env: dict) -> tuple[dict, list]:
+    """
+    Imports `module` in a fresh interpreter.
+    Returns:
+        tuple: (probe result, [(cumulative us, package)] from -X importtime)
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE, module],
+        capture_output=True, text=True, env=env
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    packages = {}
+    for line in proc.stderr.splitlines():
+        parts = line.removeprefix("import time:").split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        top = parts[2].strip().split(".")[0]
+        if top != "app":
+            # A package's outermost entry has the largest cumulative time
+            packages[top] = max(packages.get(top, 0), int(parts[1]))
+    return json.loads(proc.stdout.strip().splitlines()[-1]), sorted(((us, name) for name, us in packages.items()), reverse=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold import time of the app modules, with a budget.")
+    parser.add_argument("--modules", default=",".join(MODULES), help="Comma-separated modules to import")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS, help="Max median import time per module")
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--top", type=int, default=8, help="Slowest top-level packages to list for the first module")
+    args = parser.parse_args(argv)
+
+    env = clean_env()
+    failures = []
+    print(f"{'module':<26} {'p50 ms':>8} {'max ms':>8} {'budget':>8}  eager init")
+    for i, module in enumerate(args.modules.split(",")):
+        runs = [import_once(module, env) for _ in range(args.repeat)]
+        samples = [result["seconds"] * 1000 for result, _ in runs]
+        eager = sorted({name for result, _ in runs for name in result["eager"]})
+        median = statistics.median(samples)
+        over = median > args.budget_ms
+        print(f"{module:<26} {median:>8.0f} {max(samples):>8.0f} {'OVER' if over else 'ok':>8}  {', '.join(eager) or '-'}")
+        if over:
+            failures.append(f"{module}: {median:.0f} ms > {args.budget_ms:.0f} ms budget")
+        if eager:
+            failures.append(f"{module}: built at import: {', '.join(eager)}")
+        if i == 0 and args.top:
+            breakdown = "  ".join(f"{name} {us / 1000:.0f}" for us, name in runs[-1][1][:args.top])
+            print(f"  slowest packages (ms): {breakdown}")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        raise SystemExit(1)
+    print(f"\nAll imports within {args.budget_ms:.0f} ms, nothing built at import")
+
+if __name__ == "__main__":
+    main()
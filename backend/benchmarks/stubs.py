@@ -0,0 +1,404 @@
+"""
+Offline stand-ins for the benchmark harness: a fake chat model, a local HTTP
+server with canned HTML/PDF pages, and an in-memory Supabase table API.
+Nothing here touches the network beyond 127.0.0.1.
+"""
+import asyncio
+import copy
+import itertools
+import json
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# =============================================================================
+# FAKE LLM
+# =============================================================================
+
+# Prompt and completion tokens of every fake call, so the harness can report prompt size
+USAGE = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+FILLER_WORDS = "the model scales attention with sparse routing and the benchmark shows gains on long context tasks".split()
+
+DEFAULT_PERSONAS = [
+    {"name": "Atlas", "role": "Researcher", "style": "Academic", "backstory": "PhD in ML"},
+    {"name": "Echo", "role": "Analyst", "style": "Casual", "backstory": "Social media addict"},
+    {"name": "Neo", "role": "Hype", "style": "Excited", "backstory": "AGI Believer"},
+    {"name": "Cipher", "role": "Skeptic", "style": "Critical", "backstory": "Security Engineer"},
+]
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that sleeps `latency` seconds and answers with `output_tokens`
+    filler words (roughly one token each). Prompts that ask for the JSON the
+    pipeline parses (self-reflection score, critic verdict, personas) get
+    well-formed JSON, so every branch runs as it would against Gemini.
+    Usage metadata is filled in, so /metrics token and cost counters move.
+    Async calls go through the real LLM gateway (quota, adaptive concurrency, lanes).
+    """
+    model: str = "gemini-2.0-flash"
+    latency: float = 0.2
+    output_tokens: int = 150
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def _reply(self, messages) -> str:
+        prompt = "\n".join(str(message.content) for message in messages)
+        if "Agent Personas" in prompt:
+            return json.dumps(DEFAULT_PERSONAS)
+        if '"score"' in prompt:
+            return json.dumps({"score": 8, "feedback": "Solid coverage."})
+        if '"approved"' in prompt:
+            return json.dumps({"approved": True, "feedback": "Looks good!"})
+        return " ".join(itertools.islice(itertools.cycle(FILLER_WORDS), self.output_tokens))
+
+    def _result(self, messages) -> ChatResult:
+        text = self._reply(messages)
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4 + 1
+        output_tokens = len(text) // 4 + 1
+        USAGE["calls"] += 1
+        USAGE["input_tokens"] += input_tokens
+        USAGE["output_tokens"] += output_tokens
+        message = AIMessage(content=text, usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        })
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        from app.core.llm_gateway import gateway  # Imported late: the harness sets LLM_* env first
+
+        async def call():
+            await asyncio.sleep(self.latency)
+            return self._result(messages)
+        return await gateway.call(self.model, messages, call)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        """
+        Used under astream_events: the first chunk after a quarter of `latency`, the
+        rest spread over the remainder, ~10 words per chunk like Gemini's stream.
+        """
+        from app.core.llm_gateway import gateway
+
+        async def chunks():
+            message = self._result(messages).generations[0].message
+            words = message.content.split(" ")
+            pieces = [" ".join(words[i:i + 10]) for i in range(0, len(words), 10)]
+            await asyncio.sleep(self.latency / 4)
+            for i, piece in enumerate(pieces):
+                if i:
+                    await asyncio.sleep(self.latency * 3 / 4 / len(pieces))
+                last = i == len(pieces) - 1
+                chunk = ChatGenerationChunk(message=AIMessageChunk(
+                    content=piece if i == 0 else f" {piece}", usage_metadata=message.usage_metadata if last else None
+                ))
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+
+        async for chunk in gateway.stream(self.model, messages, chunks):
+            yield chunk
+
+# =============================================================================
+# LOCAL WEB SERVER
+# =============================================================================
+
+def make_html(page: int, paragraphs: int = 200) -> bytes:
+    """A news/forum-like page: boilerplate, scripts and styles around the article text."""
+    body = "\n".join(
+        f"<p>Paragraph {i} of page {page}: " + " ".join(FILLER_WORDS) + "</p>"
+        for i in range(paragraphs)
+    )
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Canned page {page}</title>
+<style>body {{ font-family: sans-serif; }} .ad {{ display: none; }}</style>
+<script>window.analytics = {{ track: function () {{}} }};</script></head>
+<body><nav><a href="/">Home</a> <a href="/about">About</a></nav>
+<article><h1>Canned page {page}</h1>{body}</article>
+<footer>Copyright canned pages</footer></body></html>""".encode("utf-8")
+
+def make_pdf(pages: int = 12, lines: int = 40) -> bytes:
+    """A minimal valid PDF with `pages` pages of extractable Helvetica text."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages, filled in once the kids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(pages):
+        text = "".join(
+            f"({' '.join(FILLER_WORDS[:8])} page {page} line {line}) Tj T* " for line in range(lines)
+        )
+        stream = f"BT /F1 10 Tf 12 TL 40 780 Td {text}ET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+class CannedWebServer:
+    """
+    Serves canned pages on 127.0.0.1 from a background thread:
+    - /page/<n>                  HTML article
+    - /arxiv.org/pdf/<arxiv id>  PDF paper (the path keeps the arXiv shape the workers look for)
+    Every response waits `latency` seconds first, like a remote site would.
+    """
+
+    def __init__(self, latency: float = 0.05, pdf_pages: int = 12):
+        self.latency = latency
+        self.html = {}
+        self.pdf = make_pdf(pdf_pages)
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                page = re.fullmatch(r"/page/(\d+)", self.path)
+                if page:
+                    n = int(page.group(1))
+                    body = server.html.setdefault(n, make_html(n))
+                    content_type = "text/html; charset=utf-8"
+                elif self.path.startswith("/arxiv.org/pdf/"):
+                    body = server.pdf
+                    content_type = "application/pdf"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep benchmark output readable
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="canned-web", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def page_url(self, n: int) -> str:
+        return f"{self.base_url}/page/{n}"
+
+    def pdf_url(self, arxiv_id: str) -> str:
+        return f"{self.base_url}/arxiv.org/pdf/{arxiv_id}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+# =============================================================================
+# IN-MEMORY SUPABASE
+# =============================================================================
+
+class _Response:
+    def __init__(self, data: list, count: int | None = None):
+        self.data = data
+        self.count = count
+
+class _Query:
+    """The subset of the postgrest query builder the app uses."""
+
+    def __init__(self, db, table: str):
+        self._db = db
+        self._table = table
+        self._op = "select"
+        self._payload = None
+        self._filters = []
+        self._order = None
+        self._range = None
+        self._count = None
+        self._conflict = None
+
+    def select(self, columns: str = "*", count: str | None = None):
+        self._count = count
+        return self
+
+    def insert(self, data):
+        self._op, self._payload = "insert", data
+        return self
+
+    def upsert(self, data, on_conflict: str = "", ignore_duplicates: bool = False):
+        # Only the ignore_duplicates form (ON CONFLICT DO NOTHING) is used
+        self._op, self._payload, self._conflict = "insert", data, on_conflict
+        return self
+
+    def update(self, data: dict):
+        self._op, self._payload = "update", data
+        return self
+
+    def eq(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gte(self, column: str, value):
+        self._filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self._order = (column, desc)
+        return self
+
+    def range(self, start: int, end: int):
+        self._range = (start, end)
+        return self
+
+    def limit(self, size: int):
+        self._range = (0, size - 1)
+        return self
+
+    def rpc(self, fn: str, params: dict):
+        self._op, self._payload = "rpc", (fn, params)
+        return self
+
+    def execute(self) -> _Response:
+        return self._db.execute(self)
+
+class InMemorySupabase:
+    """
+    Thread-safe stand-in for the Supabase client: tables are lists of dicts.
+    Inserted rows get a uuid `id` and a `created_at` like the real tables.
+    Each query waits `latency` seconds to mimic a round trip.
+    """
+
+    def __init__(self, latency: float = 0.01):
+        self.latency = latency
+        self.tables = {}
+        self.queries = 0
+        self._lock = threading.Lock()
+        self._clock = datetime.now(timezone.utc)
+
+    def table(self, name: str) -> _Query:
+        return _Query(self, name)
+
+    def rpc(self, fn: str, params: dict) -> _Query:
+        return _Query(self, "known_items").rpc(fn, params)
+
+    def execute(self, query: _Query) -> _Response:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.apply(query)
+
+    def apply(self, query: _Query) -> _Response:
+        """Runs a query without the simulated round trip."""
+        with self._lock:
+            self.queries += 1
+            rows = self.tables.setdefault(query._table, [])
+            if query._op == "rpc":
+                return _Response(self._call(query._payload[0], query._payload[1], rows))
+            if query._op == "insert":
+                items = query._payload if isinstance(query._payload, list) else [query._payload]
+                inserted = []
+                taken = {row.get(query._conflict) for row in rows} if query._conflict else set()
+                for item in items:
+                    if query._conflict and item.get(query._conflict) in taken:
+                        continue
+                    taken.add(item.get(query._conflict))
+                    row = dict(item)
+                    row.setdefault("id", str(uuid.uuid4()))
+                    self._clock += timedelta(microseconds=1)
+                    row.setdefault("created_at", self._clock.isoformat())
+                    rows.append(row)
+                    inserted.append(copy.deepcopy(row))
+                return _Response(inserted)
+
+            selected = [row for row in rows if all(check(row) for check in query._filters)]
+            if query._op == "update":
+                for row in selected:
+                    row.update(query._payload)
+                return _Response(copy.deepcopy(selected))
+
+            if query._order:
+                column, desc = query._order
+                selected.sort(key=lambda row: row.get(column) or "", reverse=desc)
+            count = len(selected) if query._count else None
+            if query._range:
+                selected = selected[query._range[0]:query._range[1] + 1]
+            return _Response(copy.deepcopy(selected), count)
+
+    @staticmethod
+    def _call(fn: str, params: dict, rows: list) -> list:
+        """Database functions from supabase_setup.sql."""
+        if fn != "match_documents":
+            raise ValueError(f"Unknown function: {fn}")
+        query = np.asarray(params["query_embedding"], dtype=np.float32)
+        matches = []
+        for row in rows:
+            if row.get("embedding") is None:
+                continue
+            vector = np.asarray(row["embedding"], dtype=np.float32)
+            similarity = float(vector @ query / (np.linalg.norm(vector) * np.linalg.norm(query) or 1.0))
+            if similarity > params["match_threshold"]:
+                matches.append({"id": row["id"], "similarity": similarity})
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+        return matches[:params["match_count"]]
+
+class _AsyncQuery:
+    def __init__(self, query: _Query):
+        self._query = query
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def chain(*args, **kwargs):
+            method(*args, **kwargs)
+            return self
+        return chain
+
+    async def execute(self) -> _Response:
+        db = self._query._db
+        if db.latency:
+            await asyncio.sleep(db.latency)
+        return db.apply(self._query)
+
+class AsyncInMemorySupabase:
+    """Async view of an InMemorySupabase (same tables), like the AsyncClient."""
+
+    def __init__(self, db: InMemorySupabase):
+        self.db = db
+
+    def table(self, name: str) -> _AsyncQuery:
+        return _AsyncQuery(self.db.table(name))
+
+    def rpc(self, fn: str, params: dict) -> _AsyncQuery:
+        return _AsyncQuery(self.db.rpc(fn, params))
@@ -45,15 +45,16 @@ def trigger_research_for_papers():
             }
             # Add simple auth if needed later
             res = requests.post(API_URL, json=payload)
-            if res.status_code == 200:
+            if res.status_code in (200, 202):
+                # 202: queued on the backend's worker pool (poll /research/{job_id})
                 data = res.json()
-                print(f"Result: {data['status']} - {data.get('message', 'Success')}")
+                print(f"Result: {data['status']} - {data.get('job_id') or data.get('message', 'Success')}")
             else:
                 print(f"Failed: {res.text}")
         except Exception as e:
             print(f"Request failed: {e}")
         
-        time.sleep(2) # Be nice to the API
+        time.sleep(0.2) # Jobs are queued server-side; just avoid a burst
 
 if __name__ == "__main__":
     print("Starting Ingestion Service (Polling every 12 hours)...")
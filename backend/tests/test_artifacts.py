@@ -0,0 +1,17 @@
+import pytest
+from app.agents.artifacts import artifact_key
+
+@pytest.mark.parametrize("url", [
+    "https://arxiv.org/abs/2401.12345v2",   # Arxiv abs page
+    "https://arxiv.org/pdf/2401.12345",     # HuggingFace Daily Papers pdf_url
+    "http://arxiv.org/pdf/2401.12345v1",    # Arxiv feed pdf_url
+    "https://arxiv.org/pdf/2401.12345v3.pdf",
+])
+def test_arxiv_urls_share_one_key(url):
+    assert artifact_key(url, "Paper: Some Title") == "arxiv:2401.12345"
+
+def test_url_key_ignores_scheme():
+    assert artifact_key("http://example.com/post/") == artifact_key("https://example.com/post")
+
+def test_topic_key_without_url():
+    assert artifact_key("", "Paper: Some Title") == "topic:some title"